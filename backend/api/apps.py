@@ -1,6 +1,26 @@
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
+
+    def ready(self):
+        if settings.METRICS_SAMPLE_RATE:
+            from .metrics import install_serializer_timer
+            install_serializer_timer()
+        if settings.AUTH_MODE == 'jwt':
+            from django.contrib.auth.signals import user_logged_out
+            from django.db.models.signals import post_init, post_save
+
+            from recipes.cache import GENERATION_INVALIDATORS
+            from users.models import ClaimsUser, User
+            from . import authentication
+            GENERATION_INVALIDATORS[authentication.REVOCATION_FAMILY] = (
+                authentication.invalidate_revocations,
+            )
+            for sender in (User, ClaimsUser):
+                post_init.connect(authentication.user_loaded, sender=sender)
+                post_save.connect(authentication.user_changed, sender=sender)
+            user_logged_out.connect(authentication.user_logged_out)
@@ -0,0 +1,168 @@
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+from rest_framework import serializers
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import (
+    AuthenticationFailed,
+    InvalidToken
+)
+from rest_framework_simplejwt.serializers import (
+    TokenObtainPairSerializer as BaseTokenObtainPairSerializer
+)
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from recipes.cache import bump_generation
+from users.models import ClaimsUser, RevokedToken, User
+
+REVOCATION_FAMILY = 'revocation'
+CLAIM_FIELDS = ('id', 'email', 'username', 'first_name', 'last_name')
+PRIVILEGE_FIELDS = ('is_staff', 'is_superuser', 'is_active')
+
+revocations = None
+
+
+def revocation_list():
+    """Отозванные jti и время отзыва всех токенов по пользователям.
+
+    Список хранится в памяти процесса и сбрасывается при изменении
+    поколения revocation, поэтому проверка не обращается к БД.
+    """
+    global revocations
+    if revocations is None:
+        active = RevokedToken.objects.filter(expires_at__gt=timezone.now())
+        users = active.filter(jti='').values('user_id').annotate(
+            last_revoked_at=Max('revoked_at')
+        ).values_list('user_id', 'last_revoked_at')
+        revocations = (
+            set(active.exclude(jti='').values_list('jti', flat=True)),
+            {user_id: revoked_at.timestamp()
+             for user_id, revoked_at in users},
+        )
+    return revocations
+
+
+def invalidate_revocations():
+    global revocations
+    revocations = None
+
+
+def is_revoked(token):
+    jtis, users = revocation_list()
+    if token.get(api_settings.JTI_CLAIM) in jtis:
+        return True
+    revoked_at = users.get(token.get(api_settings.USER_ID_CLAIM))
+    return revoked_at is not None and token.get('iat', 0) < int(revoked_at)
+
+
+def revoke_tokens(user_id, token=None):
+    """Отзывает токен token или все выданные пользователю токены."""
+    if settings.AUTH_MODE != 'jwt':
+        return
+    now = timezone.now()
+    if token is None:
+        jti = ''
+        expires_at = now + api_settings.REFRESH_TOKEN_LIFETIME
+    else:
+        jti = token[api_settings.JTI_CLAIM]
+        expires_at = datetime.fromtimestamp(token['exp'], dt_timezone.utc)
+    RevokedToken.objects.filter(expires_at__lte=now).delete()
+    RevokedToken.objects.create(user_id=user_id, jti=jti, revoked_at=now,
+                                expires_at=expires_at)
+    invalidate_revocations()
+    transaction.on_commit(lambda: bump_generation(REVOCATION_FAMILY))
+
+
+def add_user_claims(token, user):
+    for name in CLAIM_FIELDS[1:]:
+        token[name] = getattr(user, name)
+    token['is_active'] = user.is_active
+    return token
+
+
+def privilege_values(instance):
+    return {name: instance.__dict__[name] for name in PRIVILEGE_FIELDS
+            if name in instance.__dict__}
+
+
+def user_loaded(sender, instance, **kwargs):
+    instance._privilege_values = privilege_values(instance)
+
+
+def user_changed(sender, instance, created, **kwargs):
+    """Смена пароля, блокировка и изменение прав (is_staff,
+    is_superuser, is_active) отзывают все токены пользователя."""
+    if created:
+        return
+    previous = getattr(instance, '_privilege_values', {})
+    current = privilege_values(instance)
+    instance._privilege_values = current
+    if (getattr(instance, '_password', None) is not None
+            or any(previous.get(name, value) != value
+                   for name, value in current.items())
+            or not current.get('is_active', True)):
+        revoke_tokens(instance.pk)
+
+
+def user_logged_out(sender, user, **kwargs):
+    if user is not None and user.pk is not None:
+        revoke_tokens(user.pk)
+
+
+class TokenObtainPairSerializer(BaseTokenObtainPairSerializer):
+    """Пара токенов с данными пользователя в claims."""
+
+    @classmethod
+    def get_token(cls, user):
+        return add_user_claims(super().get_token(user), user)
+
+
+class TokenRefreshSerializer(serializers.Serializer):
+    """Новый access-токен по refresh-токену.
+
+    Проверяет отзыв и активность пользователя и обновляет claims
+    из БД - один запрос на обновление, а не на каждый запрос к API.
+    """
+
+    refresh = serializers.CharField()
+    access = serializers.CharField(read_only=True)
+
+    def validate(self, attrs):
+        refresh = RefreshToken(attrs['refresh'])
+        if is_revoked(refresh):
+            raise InvalidToken('Токен отозван!')
+        user = User.objects.filter(
+            pk=refresh[api_settings.USER_ID_CLAIM], is_active=True
+        ).first()
+        if user is None:
+            raise InvalidToken('Пользователь не найден или заблокирован!')
+        return {'access': str(add_user_claims(refresh.access_token, user))}
+
+
+class StatelessJWTAuthentication(JWTAuthentication):
+    """Аутентификация по JWT без запроса к БД.
+
+    Пользователь собирается из claims токена (ClaimsUser): флаги прав
+    в него не входят и читаются из БД при проверке, save() записывает
+    только изменённые поля поверх актуальной строки.
+    """
+
+    def get_user(self, validated_token):
+        if is_revoked(validated_token):
+            raise InvalidToken('Токен отозван!')
+        try:
+            claims = {
+                'id': validated_token[api_settings.USER_ID_CLAIM],
+                **{name: validated_token[name]
+                   for name in CLAIM_FIELDS[1:]},
+            }
+            is_active = validated_token['is_active']
+        except KeyError:
+            raise InvalidToken('Токен не содержит данных пользователя!')
+        if not is_active:
+            raise AuthenticationFailed('Пользователь заблокирован!')
+        return ClaimsUser.from_claims(claims)
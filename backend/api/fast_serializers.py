@@ -0,0 +1,365 @@
+from collections import defaultdict
+from functools import partial
+
+from django.db import connection
+from django.db.models import Count, F, IntegerField, Value, Window
+from django.db.models.functions import RowNumber
+from rest_framework.exceptions import ValidationError
+
+from recipes.cache import cached_recipe_documents, store_recipe_documents
+from recipes.models import (
+    Favorite,
+    IngredientAmount,
+    Recipe,
+    ShoppingCart
+)
+from users.models import Subscribe, User
+
+USER_FIELDS = ('email', 'id', 'username', 'first_name', 'last_name')
+FAVORITE, CART, SUBSCRIPTION = 1, 2, 3
+
+
+def requested_names(request, parameter, allowed):
+    """Имена из параметра запроса через запятую или None, если
+    параметра нет. Неизвестные имена - ошибка 400."""
+    value = request.query_params.get(parameter)
+    if value is None:
+        return None
+    names = frozenset(name.strip() for name in value.split(',')
+                      if name.strip())
+    unknown = ', '.join(sorted(names - set(allowed)))
+    if unknown:
+        raise ValidationError(
+            {parameter: f'Неизвестные поля: {unknown}!'}
+        )
+    return names
+
+
+def sparse_fieldset(request, serializer_class):
+    """Контекст сериализатора для параметров fields и expand."""
+    return {
+        'fields': requested_names(request, 'fields',
+                                  serializer_class.output_fields),
+        'expand': requested_names(request, 'expand',
+                                  serializer_class.expandable_fields),
+    }
+
+
+class FastSerializerMixin:
+    """Общая часть быстрых сериализаторов только для чтения.
+
+    Работают со строками values() вместо объектов моделей и собирают
+    ответ обычными словарями за фиксированное число запросов на
+    страницу. Вывод совпадает с соответствующими сериализаторами DRF.
+
+    В контексте можно передать fields - поля ответа и expand - связи,
+    которые выводятся вложенными объектами (остальные связи выводятся
+    идентификаторами). None - все поля, все связи развёрнуты.
+    """
+
+    image_storage = Recipe._meta.get_field('image').storage
+    output_fields = ()
+    expandable_fields = ()
+
+    def __init__(self, rows, context):
+        self.rows = list(rows)
+        self.request = context.get('request')
+        self.only = context.get('fields')
+        self.expand = context.get('expand')
+
+    def selected_fields(self):
+        return [field for field in self.output_fields
+                if self.only is None or field in self.only]
+
+    def is_expanded(self, field):
+        return self.expand is None or field in self.expand
+
+    @property
+    def user(self):
+        if self.request is None or self.request.user.is_anonymous:
+            return None
+        return self.request.user
+
+    def image_url(self, name):
+        if not name:
+            return None
+        url = self.image_storage.url(name)
+        if self.request is not None:
+            return self.request.build_absolute_uri(url)
+        return url
+
+    @property
+    def data(self):
+        return self.to_representation()
+
+    def subscribed_ids(self, author_ids):
+        if self.user is None:
+            return set()
+        return set(Subscribe.objects.filter(
+            user=self.user, author_id__in=author_ids
+        ).values_list('author_id', flat=True))
+
+
+class FastRecipeListSerializer(FastSerializerMixin):
+    """Быстрая замена RecipeListSerializer(many=True) для списка.
+
+    Общая для всех пользователей часть рецепта берётся из кэша
+    документов (один get_many на страницу), недостающие документы
+    собираются из базы. Поверх накладываются флаги текущего
+    пользователя, полученные одним запросом.
+    """
+
+    fields = ('id',)
+    output_fields = ('id', 'tags', 'author', 'ingredients', 'is_favorited',
+                     'is_in_shopping_cart', 'name', 'image', 'text',
+                     'cooking_time')
+    expandable_fields = ('tags', 'author', 'ingredients')
+
+    def build_documents(self, recipe_ids):
+        """Публичные документы рецептов без флагов пользователя."""
+        tags = defaultdict(list)
+        for link in (
+            Recipe.tags.through.objects
+            .filter(recipe_id__in=recipe_ids)
+            .order_by('tag_id')
+            .values('recipe_id', 'tag__id', 'tag__name',
+                    'tag__color', 'tag__slug')
+        ):
+            tags[link['recipe_id']].append({
+                'id': link['tag__id'],
+                'name': link['tag__name'],
+                'color': link['tag__color'],
+                'slug': link['tag__slug'],
+            })
+
+        ingredients = defaultdict(list)
+        for amount in (
+            IngredientAmount.objects
+            .filter(recipe_id__in=recipe_ids)
+            .order_by('pk')
+            .values('recipe_id', 'ingredient__id', 'ingredient__name',
+                    'ingredient__measurement_unit', 'amount')
+        ):
+            ingredients[amount['recipe_id']].append({
+                'id': amount['ingredient__id'],
+                'name': amount['ingredient__name'],
+                'measurement_unit': amount['ingredient__measurement_unit'],
+                'amount': amount['amount'],
+            })
+
+        recipes = list(Recipe.objects.filter(id__in=recipe_ids).values(
+            'id', 'author_id', 'name', 'image', 'text', 'cooking_time'
+        ))
+        authors = {
+            author['id']: {**author, 'is_subscribed': False}
+            for author in User.objects.filter(
+                id__in={recipe['author_id'] for recipe in recipes}
+            ).values(*USER_FIELDS)
+        }
+        return {recipe['id']: {
+            'id': recipe['id'],
+            'tags': tags[recipe['id']],
+            'author': authors[recipe['author_id']],
+            'ingredients': ingredients[recipe['id']],
+            'is_favorited': False,
+            'is_in_shopping_cart': False,
+            'name': recipe['name'],
+            'image': (self.image_storage.url(recipe['image'])
+                      if recipe['image'] else None),
+            'text': recipe['text'],
+            'cooking_time': recipe['cooking_time'],
+        } for recipe in recipes}
+
+    def documents(self, recipe_ids):
+        documents, stamps = cached_recipe_documents(recipe_ids)
+        missing = [recipe_id for recipe_id in recipe_ids
+                   if recipe_id not in documents]
+        if missing:
+            built = self.build_documents(missing)
+            store_recipe_documents(built, stamps)
+            documents.update(built)
+        return documents
+
+    def user_flags(self, recipe_ids, author_ids, kinds):
+        """Избранное, список покупок и подписки одним запросом.
+
+        Запрашиваются только флаги из kinds: без них запроса нет.
+        """
+        flags = {FAVORITE: set(), CART: set(), SUBSCRIPTION: set()}
+        if self.user is None or not recipe_ids or not kinds:
+            return flags
+        kind = partial(Value, output_field=IntegerField())
+        querysets = [
+            queryset.annotate(kind=kind(flag)).values_list('kind', column)
+            for flag, queryset, column in (
+                (FAVORITE, Favorite.objects.filter(
+                    user=self.user, recipe_id__in=recipe_ids
+                ), 'recipe_id'),
+                (CART, ShoppingCart.objects.filter(
+                    user=self.user, recipe_id__in=recipe_ids
+                ), 'recipe_id'),
+                (SUBSCRIPTION, Subscribe.objects.filter(
+                    user=self.user, author_id__in=author_ids
+                ), 'author_id'),
+            ) if flag in kinds
+        ]
+        for flag, object_id in querysets[0].union(*querysets[1:], all=True):
+            flags[flag].add(object_id)
+        return flags
+
+    def to_representation(self):
+        recipe_ids = [row['id'] for row in self.rows]
+        documents = self.documents(recipe_ids)
+        recipe_ids = [recipe_id for recipe_id in recipe_ids
+                      if recipe_id in documents]
+        fields = self.selected_fields()
+        kinds = {flag for flag, needed in (
+            (FAVORITE, 'is_favorited' in fields),
+            (CART, 'is_in_shopping_cart' in fields),
+            (SUBSCRIPTION, 'author' in fields and self.is_expanded('author')),
+        ) if needed}
+        flags = self.user_flags(recipe_ids, {
+            documents[recipe_id]['author']['id'] for recipe_id in recipe_ids
+        }, kinds)
+        return [self.recipe(documents[recipe_id], fields, flags)
+                for recipe_id in recipe_ids]
+
+    def recipe(self, document, fields, flags):
+        """Запрошенные поля документа с флагами пользователя."""
+        data = {field: document[field] for field in fields}
+        if 'tags' in data and not self.is_expanded('tags'):
+            data['tags'] = [tag['id'] for tag in document['tags']]
+        if 'author' in data:
+            author = document['author']
+            data['author'] = (
+                {**author,
+                 'is_subscribed': author['id'] in flags[SUBSCRIPTION]}
+                if self.is_expanded('author') else author['id']
+            )
+        if 'ingredients' in data and not self.is_expanded('ingredients'):
+            data['ingredients'] = [
+                {'id': ingredient['id'], 'amount': ingredient['amount']}
+                for ingredient in document['ingredients']
+            ]
+        if 'is_favorited' in data:
+            data['is_favorited'] = document['id'] in flags[FAVORITE]
+        if 'is_in_shopping_cart' in data:
+            data['is_in_shopping_cart'] = document['id'] in flags[CART]
+        if 'image' in data:
+            data['image'] = self.document_image(document)
+        return data
+
+    def document_image(self, document):
+        if self.request is None or not document['image']:
+            return document['image']
+        return self.request.build_absolute_uri(document['image'])
+
+
+class FastShortRecipeSerializer(FastRecipeListSerializer):
+    """Быстрая замена ShortRecipeSerializer: поля из кэша документов."""
+
+    def to_representation(self):
+        documents = self.documents([row['id'] for row in self.rows])
+        return [{
+            'id': document['id'],
+            'name': document['name'],
+            'image': self.document_image(document),
+            'cooking_time': document['cooking_time'],
+        } for document in (documents[row['id']] for row in self.rows
+                           if row['id'] in documents)]
+
+
+class FastSubscribeListSerializer(FastSerializerMixin):
+    """Быстрая замена SubscribeListSerializer(many=True) для подписок."""
+
+    fields = USER_FIELDS
+    output_fields = USER_FIELDS + ('is_subscribed', 'recipes',
+                                   'recipes_count')
+    expandable_fields = ('recipes',)
+
+    def recipes_limit(self):
+        """Число рецептов автора в выдаче из recipes_limit (прежнее
+        имя - recipe_limit) или None - без ограничения."""
+        value = (self.request.query_params.get('recipes_limit')
+                 or self.request.query_params.get('recipe_limit'))
+        return int(value) if value and value.isdigit() else None
+
+    def author_recipes(self, author_ids, limit):
+        """Рецепты авторов: полные или только id, если recipes
+        не развёрнуты.
+
+        С ограничением limit лишние строки отсекаются в базе: рецепты
+        нумеруются оконной функцией ROW_NUMBER() по автору.
+        """
+        expanded = self.is_expanded('recipes')
+        columns = (('author_id', 'id', 'name', 'image', 'cooking_time')
+                   if expanded else ('author_id', 'id'))
+        ordering = (*Recipe._meta.ordering, 'pk')
+        queryset = Recipe.objects.filter(author_id__in=author_ids)
+        if limit is None:
+            rows = queryset.order_by(*ordering).values(*columns)
+        else:
+            sql, params = queryset.annotate(recipe_position=Window(
+                RowNumber(),
+                partition_by=F('author_id'),
+                order_by=[F(name) for name in ordering]
+            )).order_by().values(
+                *columns, 'recipe_position'
+            ).query.sql_with_params()
+            position = connection.ops.quote_name('recipe_position')
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f'SELECT * FROM ({sql}) ranked WHERE {position} <= %s '
+                    f'ORDER BY {connection.ops.quote_name("author_id")}, '
+                    f'{position}',
+                    (*params, limit)
+                )
+                names = [column[0] for column in cursor.description]
+                rows = [dict(zip(names, row)) for row in cursor.fetchall()]
+        recipes = defaultdict(list)
+        for recipe in rows:
+            recipe.pop('recipe_position', None)
+            recipes[recipe.pop('author_id')].append(
+                recipe if expanded else recipe['id']
+            )
+        return recipes
+
+    def recipes_counts(self, author_ids):
+        return dict(
+            Recipe.objects.filter(author_id__in=author_ids)
+            .values('author_id').annotate(count=Count('id'))
+            .values_list('author_id', 'count')
+        )
+
+    def to_representation(self):
+        author_ids = [row['id'] for row in self.rows]
+        fields = self.selected_fields()
+        limit = self.recipes_limit()
+        recipes = counts = subscribed = None
+        if 'recipes' in fields:
+            recipes = self.author_recipes(author_ids, limit)
+        if 'recipes_count' in fields:
+            counts = (
+                {author_id: len(items) for author_id, items in recipes.items()}
+                if recipes is not None and limit is None
+                else self.recipes_counts(author_ids)
+            )
+        if 'is_subscribed' in fields:
+            subscribed = self.subscribed_ids(author_ids)
+
+        data = []
+        for row in self.rows:
+            item = {field: row[field] for field in fields
+                    if field in USER_FIELDS}
+            if subscribed is not None:
+                item['is_subscribed'] = row['id'] in subscribed
+            if recipes is not None:
+                shown = recipes[row['id']]
+                if self.is_expanded('recipes'):
+                    for recipe in shown:
+                        recipe['image'] = self.image_url(recipe['image'])
+                item['recipes'] = shown
+            if counts is not None:
+                item['recipes_count'] = counts.get(row['id'], 0)
+            data.append(item)
+        return data
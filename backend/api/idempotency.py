@@ -0,0 +1,119 @@
+import hashlib
+import time
+from datetime import timedelta
+from functools import wraps
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+from foodgram.constants import IDEMPOTENCY_KEY_MAX_LENGTH
+from recipes.models import IdempotencyKey
+
+POLL_INTERVAL = 0.05
+
+
+def request_fingerprint(request):
+    """Хэш метода, пути и тела запроса."""
+    digest = hashlib.sha256(
+        f'{request.method} {request.get_full_path()}\n'.encode()
+    )
+    digest.update(request.body)
+    return digest.hexdigest()
+
+
+def claim_key(user_id, key, fingerprint):
+    """Пытается занять ключ одним INSERT ... ON CONFLICT DO NOTHING.
+
+    Перед этим удаляются просроченные ключи пользователя и ключи
+    запросов, которые не завершились за IDEMPOTENCY_LOCK_TIMEOUT.
+    Возвращает id занятой записи или None, если ключ уже занят.
+    """
+    now = timezone.now()
+    IdempotencyKey.objects.filter(
+        Q(created_at__lt=now - timedelta(seconds=settings.IDEMPOTENCY_TTL))
+        | Q(status__isnull=True, created_at__lt=now - timedelta(
+            seconds=settings.IDEMPOTENCY_LOCK_TIMEOUT
+        )),
+        user_id=user_id
+    ).delete()
+    meta = IdempotencyKey._meta
+    quote = connection.ops.quote_name
+    columns = ', '.join(quote(meta.get_field(name).column) for name in (
+        'user', 'key', 'fingerprint', 'created_at'
+    ))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {quote(meta.db_table)} ({columns}) '
+            f'VALUES (%s, %s, %s, %s) ON CONFLICT DO NOTHING '
+            f'RETURNING {quote(meta.pk.column)}',
+            [user_id, key, fingerprint,
+             meta.get_field('created_at').get_db_prep_save(now, connection)]
+        )
+        row = cursor.fetchone()
+    return row[0] if row is not None else None
+
+
+def idempotent(handler):
+    """Поддержка заголовка Idempotency-Key в обработчике записи.
+
+    Первый запрос с ключом выполняется, его ответ сохраняется
+    на IDEMPOTENCY_TTL секунд и возвращается повторам без выполнения
+    (с заголовком Idempotent-Replayed). Повтор, пришедший во время
+    выполнения первого запроса, ждёт его ответ не дольше
+    IDEMPOTENCY_WAIT секунд, затем получает 409. Тот же ключ с другим
+    телом или путём - 422. Если обработчик упал с исключением или
+    ответил 5xx, ключ освобождается и запрос можно повторить.
+    """
+
+    @wraps(handler)
+    def wrapper(self, request, *args, **kwargs):
+        key = request.headers.get('Idempotency-Key')
+        if key is None or not request.user.is_authenticated:
+            return handler(self, request, *args, **kwargs)
+        if not key or len(key) > IDEMPOTENCY_KEY_MAX_LENGTH:
+            return Response({'error': 'Некорректный Idempotency-Key!'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        fingerprint = request_fingerprint(request)
+        deadline = time.monotonic() + settings.IDEMPOTENCY_WAIT
+        while True:
+            record_id = claim_key(request.user.id, key, fingerprint)
+            if record_id is not None:
+                break
+            record = IdempotencyKey.objects.filter(
+                user_id=request.user.id, key=key
+            ).values('fingerprint', 'status', 'response').first()
+            if record is None:
+                continue
+            if record['fingerprint'] != fingerprint:
+                return Response(
+                    {'error': 'Ключ уже использован для другого запроса!'},
+                    status=status.HTTP_422_UNPROCESSABLE_ENTITY
+                )
+            if record['status'] is not None:
+                return Response(record['response'], status=record['status'],
+                                headers={'Idempotent-Replayed': 'true'})
+            if time.monotonic() > deadline:
+                return Response(
+                    {'error': 'Запрос с этим ключом ещё выполняется!'},
+                    status=status.HTTP_409_CONFLICT
+                )
+            time.sleep(POLL_INTERVAL)
+
+        records = IdempotencyKey.objects.filter(pk=record_id)
+        try:
+            response = handler(self, request, *args, **kwargs)
+        except Exception:
+            records.delete()
+            raise
+        if response.status_code >= 500:
+            records.delete()
+        else:
+            records.update(status=response.status_code,
+                           response=response.data)
+        return response
+
+    return wrapper
@@ -0,0 +1,174 @@
+import threading
+import time
+from collections import defaultdict
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+from rest_framework import serializers
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25,
+                    0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+current_stats = ContextVar('current_stats', default=None)
+
+
+class RequestStats:
+    """Счётчики одного запроса: SQL, время БД и сериализации."""
+
+    __slots__ = ('queries', 'db_time', 'serializer_time',
+                 'serializer_depth')
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.serializer_time = 0.0
+        self.serializer_depth = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.db_time += time.perf_counter() - start
+
+
+class Histogram:
+    """Гистограмма в формате Prometheus (кумулятивные корзины)."""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value):
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                break
+        else:
+            index = len(self.buckets)
+        self.counts[index] += 1
+        self.sum += value
+
+    def render(self, name, labels):
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{labels},le="{bound}"}} '
+                         f'{cumulative}')
+        cumulative += self.counts[-1]
+        lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {cumulative}')
+        lines.append(f'{name}_sum{{{labels}}} {self.sum}')
+        lines.append(f'{name}_count{{{labels}}} {cumulative}')
+        return lines
+
+
+class MetricsRegistry:
+    """Агрегированные по эндпоинтам метрики текущего процесса."""
+
+    METRICS = (
+        ('foodgram_request_duration_seconds',
+         'Полное время обработки запроса.', DURATION_BUCKETS),
+        ('foodgram_db_duration_seconds',
+         'Суммарное время SQL-запросов.', DURATION_BUCKETS),
+        ('foodgram_serializer_duration_seconds',
+         'Время сериализации ответа.', DURATION_BUCKETS),
+        ('foodgram_db_queries',
+         'Количество SQL-запросов.', QUERY_BUCKETS),
+        ('foodgram_response_size_bytes',
+         'Размер тела ответа.', SIZE_BUCKETS),
+    )
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.collectors = []
+        self._reset()
+
+    def add_collector(self, collector):
+        """Добавляет функцию, возвращающую строки метрик при выгрузке."""
+        self.collectors.append(collector)
+
+    def _reset(self):
+        self.histograms = {
+            name: defaultdict(lambda buckets=buckets: Histogram(buckets))
+            for name, _, buckets in self.METRICS
+        }
+
+    def observe(self, endpoint, method, status, duration, stats, size):
+        key = (endpoint, method, str(status))
+        values = (duration, stats.db_time, stats.serializer_time,
+                  stats.queries, size)
+        with self._lock:
+            for (name, _, _), value in zip(self.METRICS, values):
+                if value is not None:
+                    self.histograms[name][key].observe(value)
+
+    def render(self):
+        lines = []
+        with self._lock:
+            for name, help_text, _ in self.METRICS:
+                lines.append(f'# HELP {name} {help_text}')
+                lines.append(f'# TYPE {name} histogram')
+                for (endpoint, method, status), histogram in sorted(
+                    self.histograms[name].items()
+                ):
+                    labels = (f'endpoint="{endpoint}",method="{method}",'
+                              f'status="{status}"')
+                    lines.extend(histogram.render(name, labels))
+        for collector in self.collectors:
+            lines.extend(collector())
+        return '\n'.join(lines) + '\n'
+
+    def clear(self):
+        with self._lock:
+            self._reset()
+
+
+registry = MetricsRegistry()
+
+
+def _timed_data(data_property):
+    """Оборачивает свойство `data` сериализатора замером времени.
+
+    Учитывается только внешний вызов, вложенные сериализаторы
+    (например, в SerializerMethodField) в общее время не добавляются.
+    """
+    getter = data_property.fget
+
+    def data(self):
+        stats = current_stats.get()
+        if stats is None:
+            return getter(self)
+        stats.serializer_depth += 1
+        start = time.perf_counter()
+        try:
+            return getter(self)
+        finally:
+            stats.serializer_depth -= 1
+            if not stats.serializer_depth:
+                stats.serializer_time += time.perf_counter() - start
+
+    return property(data)
+
+
+def install_serializer_timer():
+    """Подключает замер времени сериализации ко всем сериализаторам."""
+    from .fast_serializers import FastSerializerMixin
+
+    for cls in (serializers.Serializer, serializers.ListSerializer,
+                FastSerializerMixin):
+        if not getattr(cls.data.fget, '_timed', False):
+            cls.data = _timed_data(cls.data)
+            cls.data.fget._timed = True
+
+
+def metrics_view(request):
+    """Метрики в текстовом формате Prometheus для внутренней сети."""
+    if request.META.get('REMOTE_ADDR') not in settings.METRICS_ALLOWED_IPS:
+        return HttpResponseForbidden()
+    return HttpResponse(registry.render(),
+                        content_type='text/plain; version=0.0.4')
@@ -0,0 +1,67 @@
+import random
+import time
+
+from django.conf import settings
+from django.db import connections
+
+from recipes.cache import sync_generations_if_due
+from .metrics import RequestStats, current_stats, registry
+
+
+class CacheCoherenceMiddleware:
+    """Перед запросом сверяет счётчики поколений моделей (не чаще
+    раза в GENERATION_SYNC_INTERVAL секунд) и сбрасывает устаревшие
+    записи кэша процесса.
+
+    Проверки /live и /ready пропускаются: /live не должен обращаться
+    к БД, а /ready проверяет её сам и при недоступной БД должен
+    отвечать 503, а не 500.
+    """
+
+    exempt_paths = frozenset(('/live', '/ready'))
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if request.path_info not in self.exempt_paths:
+            sync_generations_if_due()
+        return self.get_response(request)
+
+
+class PerformanceMiddleware:
+    """Замер времени запроса, количества SQL-запросов, времени БД,
+    сериализации и размера ответа.
+
+    Обрабатывается только доля запросов METRICS_SAMPLE_RATE, для них же
+    добавляется заголовок Server-Timing.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sample_rate = settings.METRICS_SAMPLE_RATE
+
+    def __call__(self, request):
+        if not self.sample_rate or random.random() >= self.sample_rate:
+            return self.get_response(request)
+        stats = RequestStats()
+        token = current_stats.set(stats)
+        start = time.perf_counter()
+        try:
+            with connections['default'].execute_wrapper(stats):
+                response = self.get_response(request)
+        finally:
+            current_stats.reset(token)
+        duration = time.perf_counter() - start
+        size = None if response.streaming else len(response.content)
+        match = request.resolver_match
+        endpoint = (match.view_name if match is not None
+                    else 'unresolved')
+        registry.observe(endpoint, request.method, response.status_code,
+                         duration, stats, size)
+        response['Server-Timing'] = (
+            f'db;dur={stats.db_time * 1000:.1f};desc="{stats.queries} q", '
+            f'ser;dur={stats.serializer_time * 1000:.1f}, '
+            f'total;dur={duration * 1000:.1f}'
+        )
+        return response
@@ -0,0 +1,128 @@
+import logging
+import os
+import re
+import sys
+import traceback
+from collections import defaultdict
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connections
+from rest_framework import serializers
+
+from . import metrics, middleware
+
+logger = logging.getLogger('foodgram.nplusone')
+
+LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+IN_LISTS = re.compile(r'\bIN\s*\((?:\s*(?:%s|\?)\s*,?)+\)', re.IGNORECASE)
+SPACES = re.compile(r'\s+')
+INSTRUMENTATION_FILES = (__file__, metrics.__file__, middleware.__file__)
+
+
+class NPlusOneError(AssertionError):
+    """Один и тот же запрос выполняется в цикле с разными параметрами."""
+
+
+def fingerprint(sql):
+    """Нормализует SQL: литералы и списки IN заменяются заглушками."""
+    sql = LITERALS.sub('?', sql)
+    sql = IN_LISTS.sub('IN (...)', sql)
+    return SPACES.sub(' ', sql).strip()
+
+
+def find_serializer_field():
+    """Ищет в стеке поле сериализатора, которое сейчас отрисовывается."""
+    frame = sys._getframe(2)
+    while frame is not None:
+        owner = frame.f_locals.get('self')
+        if (frame.f_code.co_name == 'to_representation'
+                and isinstance(owner, serializers.Serializer)
+                and 'field' in frame.f_locals):
+            return (f'{type(owner).__name__}.'
+                    f'{frame.f_locals["field"].field_name}')
+        frame = frame.f_back
+    return None
+
+
+def find_project_frame():
+    """Последний кадр стека из кода проекта (без инструментирования)."""
+    base_dir = str(settings.BASE_DIR)
+    for frame in reversed(traceback.extract_stack()[:-2]):
+        if (frame.filename.startswith(base_dir)
+                and os.path.dirname(frame.filename) != base_dir
+                and frame.filename not in INSTRUMENTATION_FILES):
+            return f'{frame.filename}:{frame.lineno} in {frame.name}'
+    return None
+
+
+class NPlusOneDetector:
+    """Обёртка выполнения SQL, считающая повторы нормализованных запросов.
+
+    Запрос считается N+1, если его отпечаток выполнен не меньше
+    threshold раз с разными параметрами. В режиме raise исключение
+    поднимается сразу, чтобы трассировка указывала на место появления.
+    """
+
+    def __init__(self, threshold=None, mode=None):
+        self.threshold = threshold or settings.NPLUSONE_THRESHOLD
+        self.mode = mode or settings.NPLUSONE_MODE
+        self.params = defaultdict(set)
+        self.reports = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        if not many:
+            key = fingerprint(sql)
+            seen = self.params[key]
+            seen.add(repr(params))
+            if len(seen) >= self.threshold and key not in self.reports:
+                self.report(key)
+        return execute(sql, params, many, context)
+
+    def report(self, key):
+        report = {
+            'sql': key,
+            'count': len(self.params[key]),
+            'field': find_serializer_field(),
+            'frame': find_project_frame(),
+        }
+        self.reports[key] = report
+        if self.mode == 'raise':
+            raise NPlusOneError(
+                'Обнаружен N+1 запрос в {field} ({frame}): {sql}'.format(
+                    **report
+                )
+            )
+
+    def log(self, request):
+        for key, report in self.reports.items():
+            report['count'] = len(self.params[key])
+            logger.warning(
+                'N+1 query in %s', report['field'] or report['frame'],
+                extra={'nplusone': {**report, 'path': request.path,
+                                    'method': request.method}}
+            )
+
+
+@contextmanager
+def detect_n_plus_one(threshold=None, mode='raise'):
+    """Контекстный менеджер для тестов: падает на первом N+1."""
+    detector = NPlusOneDetector(threshold=threshold, mode=mode)
+    with connections['default'].execute_wrapper(detector):
+        yield detector
+
+
+class NPlusOneMiddleware:
+    """Проверка запросов на N+1 (NPLUSONE_MODE: off, log или raise)."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if settings.NPLUSONE_MODE not in ('log', 'raise'):
+            return self.get_response(request)
+        detector = NPlusOneDetector()
+        with connections['default'].execute_wrapper(detector):
+            response = self.get_response(request)
+        detector.log(request)
+        return response
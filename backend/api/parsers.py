@@ -0,0 +1,27 @@
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+
+from recipes.importer import FormatError, read_csv, read_ndjson
+
+
+class NDJSONParser(BaseParser):
+    """Поток записей импорта из NDJSON (без чтения тела целиком)."""
+
+    media_type = 'application/x-ndjson'
+    reader = staticmethod(read_ndjson)
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        encoding = (parser_context or {}).get('encoding',
+                                              settings.DEFAULT_CHARSET)
+        try:
+            return self.reader(stream, encoding)
+        except FormatError as error:
+            raise ParseError(str(error))
+
+
+class CSVParser(NDJSONParser):
+    """Поток записей импорта из CSV."""
+
+    media_type = 'text/csv'
+    reader = staticmethod(read_csv)
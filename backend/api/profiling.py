@@ -0,0 +1,257 @@
+import cProfile
+import hmac
+import inspect
+import io
+import json
+import logging
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+import uuid
+
+from django.conf import settings
+from django.db import DatabaseError, connection, connections
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.settings import api_settings
+
+from recipes.cache import bump_generation
+from recipes.models import CacheGeneration
+
+logger = logging.getLogger('foodgram.profiling')
+
+MEMORY_FAMILY = 'memory'
+PROFILE_TOP = 40
+MEMORY_TOP = 25
+
+profiling_lock = threading.Lock()
+memory_lock = threading.Lock()
+previous_snapshot = None
+
+
+class SQLLog:
+    """Обёртка выполнения SQL, записывающая запросы без параметров."""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append({
+                'sql': sql,
+                'many': many,
+                'ms': round((time.perf_counter() - start) * 1000, 3),
+            })
+
+
+def profiling_allowed(request):
+    """Профилировать можно по внутреннему ключу или с токеном
+    (сессией) сотрудника."""
+    key = request.META.get('HTTP_X_PROFILE_KEY')
+    if settings.PROFILING_KEY and key is not None and hmac.compare_digest(
+        key.encode(), settings.PROFILING_KEY.encode()
+    ):
+        return True
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        return user.is_staff
+    for authentication_class in api_settings.DEFAULT_AUTHENTICATION_CLASSES:
+        try:
+            result = authentication_class().authenticate(request)
+        except AuthenticationFailed:
+            return False
+        if result is not None:
+            return result[0].is_staff
+    return False
+
+
+def save_profile(profiler, sql_log, request, response, duration):
+    """Сохраняет pstats (.prof) и отчёт с журналом SQL (.json),
+    возвращает идентификатор профиля."""
+    os.makedirs(settings.PROFILING_DIR, exist_ok=True)
+    profile_id = (f'{time.strftime("%Y%m%d-%H%M%S")}-{os.getpid()}-'
+                  f'{uuid.uuid4().hex[:8]}')
+    path = os.path.join(settings.PROFILING_DIR, profile_id)
+    profiler.dump_stats(f'{path}.prof')
+    stream = io.StringIO()
+    pstats.Stats(profiler, stream=stream).sort_stats(
+        'cumulative'
+    ).print_stats(PROFILE_TOP)
+    match = request.resolver_match
+    with open(f'{path}.json', 'w', encoding='utf-8') as file:
+        json.dump({
+            'method': request.method,
+            'path': request.get_full_path(),
+            'view': match.view_name if match is not None else None,
+            'status': response.status_code,
+            'ms': round(duration * 1000, 3),
+            'db_ms': round(sum(query['ms'] for query in sql_log.queries), 3),
+            'queries': sql_log.queries,
+            'stats': stream.getvalue(),
+        }, file, ensure_ascii=False, indent=2)
+    return profile_id
+
+
+class ProfilingMiddleware:
+    """Профилирование отдельного запроса по заголовку X-Profile.
+
+    Запрос выполняется под cProfile с журналом SQL, результат
+    сохраняется в PROFILING_DIR, идентификатор возвращается
+    в заголовке X-Profile-Id. Одновременно профилируется только один
+    запрос процесса, остальные выполняются как обычно.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if ('HTTP_X_PROFILE' not in request.META
+                or not profiling_allowed(request)
+                or not profiling_lock.acquire(blocking=False)):
+            return self.get_response(request)
+        try:
+            profiler = cProfile.Profile()
+            sql_log = SQLLog()
+            start = time.perf_counter()
+            with connections['default'].execute_wrapper(sql_log):
+                profiler.enable()
+                try:
+                    response = self.get_response(request)
+                finally:
+                    profiler.disable()
+            duration = time.perf_counter() - start
+            response['X-Profile-Id'] = save_profile(profiler, sql_log,
+                                                    request, response,
+                                                    duration)
+            return response
+        finally:
+            profiling_lock.release()
+
+
+def memory_areas():
+    """Участки кода, для которых считается объём выделенной памяти:
+    файл и диапазон строк."""
+    import PIL
+    from drf_extra_fields.fields import Base64ImageField
+
+    from .fast_serializers import FastRecipeListSerializer
+    from .serializers import RecipeListSerializer
+    from .views import RecipeViewSet
+
+    areas = {}
+    for name, code in (
+        ('RecipeListSerializer', RecipeListSerializer),
+        ('FastRecipeListSerializer', FastRecipeListSerializer),
+        ('Base64ImageField', Base64ImageField),
+        ('download_shopping_cart', RecipeViewSet.download_shopping_cart),
+    ):
+        lines, first = inspect.getsourcelines(code)
+        areas[name] = (inspect.getsourcefile(code), first,
+                       first + len(lines) - 1)
+    areas['PIL'] = (os.path.dirname(PIL.__file__), None, None)
+    return areas
+
+
+def in_area(frame, area):
+    filename, first, last = area
+    if first is None:
+        return frame.filename.startswith(filename)
+    return frame.filename == filename and first <= frame.lineno <= last
+
+
+def memory_generation():
+    return CacheGeneration.objects.filter(
+        family=MEMORY_FAMILY
+    ).values_list('value', flat=True).first()
+
+
+def watch_memory_requests(seen):
+    """Поток процесса: раз в MEMORY_SNAPSHOT_POLL_INTERVAL секунд
+    проверяет поколение MEMORY_FAMILY и при его изменении снимает
+    tracemalloc. Запросы пользователей в этом не участвуют."""
+    while True:
+        time.sleep(settings.MEMORY_SNAPSHOT_POLL_INTERVAL)
+        try:
+            value = memory_generation()
+        except DatabaseError:
+            logger.exception('Memory snapshot poll failed')
+            continue
+        finally:
+            connection.close()
+        if value != seen:
+            seen = value
+            take_memory_snapshot()
+
+
+def start_tracemalloc():
+    """Включает tracemalloc в процессе (TRACEMALLOC_FRAMES кадров)
+    и запускает поток, снимающий память по запросу из
+    request_memory_snapshots. Текущее поколение запоминается заранее,
+    чтобы запросы, сделанные до запуска процесса, не сработали.
+    """
+    try:
+        seen = memory_generation()
+    except DatabaseError:
+        logger.exception('Memory snapshot poll failed')
+        seen = None
+    finally:
+        connection.close()
+    tracemalloc.start(settings.TRACEMALLOC_FRAMES)
+    threading.Thread(target=watch_memory_requests, args=(seen,),
+                     name='memory-snapshots', daemon=True).start()
+
+
+def request_memory_snapshots():
+    """Просит остальные процессы снять tracemalloc (их потоки
+    заметят новое поколение), этот процесс снимает его сразу."""
+    bump_generation(MEMORY_FAMILY)
+    return take_memory_snapshot()
+
+
+def take_memory_snapshot():
+    """Сохраняет снимок памяти процесса: объём по участкам из
+    memory_areas, крупнейшие места выделения и рост с прошлого
+    снимка. Возвращает имя файла или None, если tracemalloc выключен."""
+    if not tracemalloc.is_tracing():
+        return None
+    with memory_lock:
+        return save_memory_snapshot()
+
+
+def save_memory_snapshot():
+    global previous_snapshot
+    snapshot = tracemalloc.take_snapshot().filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+    ))
+    areas = memory_areas()
+    totals = dict.fromkeys(areas, 0)
+    for statistic in snapshot.statistics('traceback'):
+        for name, area in areas.items():
+            if any(in_area(frame, area) for frame in statistic.traceback):
+                totals[name] += statistic.size
+    current, peak = tracemalloc.get_traced_memory()
+    lines = [f'pid {os.getpid()}: {current / 1024:.1f} KiB, '
+             f'пик {peak / 1024:.1f} KiB', '', 'По участкам кода:']
+    lines.extend(f'  {name}: {size / 1024:.1f} KiB'
+                 for name, size in totals.items())
+    lines.extend(['', 'Крупнейшие места выделения:'])
+    lines.extend(f'  {statistic}' for statistic in
+                 snapshot.statistics('lineno')[:MEMORY_TOP])
+    if previous_snapshot is not None:
+        lines.extend(['', 'Рост с прошлого снимка:'])
+        lines.extend(f'  {statistic}' for statistic in snapshot.compare_to(
+            previous_snapshot, 'lineno'
+        )[:MEMORY_TOP])
+    previous_snapshot = snapshot
+    os.makedirs(settings.PROFILING_DIR, exist_ok=True)
+    name = f'memory-{time.strftime("%Y%m%d-%H%M%S")}-{os.getpid()}.txt'
+    with open(os.path.join(settings.PROFILING_DIR, name), 'w',
+              encoding='utf-8') as file:
+        file.write('\n'.join(lines) + '\n')
+    logger.info('Memory snapshot saved to %s', name)
+    return name
@@ -2,9 +2,6 @@ from django.db.transaction import atomic
 from djoser.serializers import UserSerializer
 from drf_extra_fields.fields import Base64ImageField
 from rest_framework import serializers
-from rest_framework.validators import (
-    UniqueTogetherValidator
-)
 
 from recipes.models import (
     Favorite,
@@ -74,36 +71,6 @@ class SubscribeListSerializer(serializers.ModelSerializer):
                                         author=obj.id).exists()
 
 
-class SubscribeSerializer(serializers.ModelSerializer):
-    """Serializer для создания подписки."""
-
-    class Meta:
-        model = Subscribe
-        fields = ('user', 'author')
-        validators = [
-            UniqueTogetherValidator(
-                queryset=Subscribe.objects.all(),
-                fields=('user', 'author'),
-                message='Вы уже подписаны на этого пользователя'
-            )
-        ]
-
-    def validate(self, data):
-        user = self.context.get('request').user
-        author = data['author']
-        if user == author:
-            raise serializers.ValidationError(
-                'Вы не можете подписаться сами на себя!'
-            )
-        return data
-
-    def to_representation(self, instance):
-        request = self.context.get('request')
-        return SubscribeListSerializer(
-            instance.author, context={'request': request}
-        ).data
-
-
 class TagSerializer(serializers.ModelSerializer):
     """Serializer для модели Тега."""
 
@@ -272,53 +239,3 @@ class RecipeSerializer(serializers.ModelSerializer):
         request = self.context.get('request')
         context = {'request': request}
         return RecipeListSerializer(instance, context=context).data
-
-
-class ShoppingCartSerializer(serializers.ModelSerializer):
-    """Serializer для списка покупок."""
-
-    class Meta:
-        model = ShoppingCart
-        fields = ('recipe', 'user')
-
-    def validate(self, data):
-        request = self.context.get('request')
-        if request.user.is_anonymous:
-            return False
-        recipe = data['recipe']
-        if ShoppingCart.objects.filter(user=request.user,
-                                       recipe=recipe).exists():
-            raise serializers.ValidationError(
-                'Рецепт уже добавлен в список покупок!'
-            )
-        return data
-
-    def to_representation(self, instance):
-        request = self.context.get('request')
-        context = {'request': request}
-        return ShortRecipeSerializer(instance.recipe, context=context).data
-
-
-class FavoriteSerializer(serializers.ModelSerializer):
-    """Serializer для избранного."""
-
-    class Meta:
-        model = Favorite
-        fields = ('recipe', 'user')
-
-    def validate(self, data):
-        request = self.context.get('request')
-        if request.user.is_anonymous:
-            return False
-        recipe = data['recipe']
-        if Favorite.objects.filter(user=request.user,
-                                   recipe=recipe).exists():
-            raise serializers.ValidationError(
-                'Рецепт уже добавлен в избранное!'
-            )
-        return data
-
-    def to_representation(self, instance):
-        request = self.context.get('request')
-        context = {'request': request}
-        return ShortRecipeSerializer(instance.recipe, context=context).data
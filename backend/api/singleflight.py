@@ -0,0 +1,137 @@
+import hashlib
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.urls import Resolver404, resolve
+from rest_framework.exceptions import Throttled
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.views import exception_handler
+
+from recipes.cache import local_generations
+
+SINGLE_FLIGHT_VIEWS = frozenset((
+    'recipe-list', 'recipe-detail',
+    'tag-list', 'tag-detail',
+    'ingredient-list', 'ingredient-detail',
+))
+SINGLE_FLIGHT_FAMILIES = ('tag', 'ingredient', 'recipe')
+POLL_INTERVAL = 0.05
+
+
+def flight_key(request):
+    """Ключ запроса, который можно объединять с одинаковыми, или None.
+
+    В ключ входят поколения тегов, ингредиентов и рецептов: после
+    изменения данных запросы получают новый ключ и не делят старый
+    результат.
+    """
+    if (request.method != 'GET'
+            or 'HTTP_AUTHORIZATION' in request.META
+            or 'HTTP_X_PROFILE' in request.META
+            or request.user.is_authenticated):
+        return None
+    try:
+        view_name = resolve(request.path_info).view_name
+    except Resolver404:
+        return None
+    if view_name not in SINGLE_FLIGHT_VIEWS:
+        return None
+    generations = ':'.join(str(local_generations.get(family))
+                           for family in SINGLE_FLIGHT_FAMILIES)
+    raw = '|'.join((request.get_host(), request.get_full_path(),
+                    request.META.get('HTTP_ACCEPT', ''), generations))
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+
+def shared_response(entry):
+    headers, content = entry
+    response = HttpResponse(content)
+    for header, value in headers:
+        response[header] = value
+    response['X-Single-Flight'] = 'shared'
+    return response
+
+
+def charge_shared(request):
+    """Проверяет троттлинг для запроса, получившего общий ответ: DRF
+    такой запрос не выполнял, но стоимость списывается как за обычный.
+
+    Возвращает ответ 429 или None.
+    """
+    match = resolve(request.path_info)
+    view = match.func.cls(**match.func.initkwargs)
+    view.action = match.func.actions.get(request.method.lower())
+    request = Request(request)
+    view.request = request
+    for throttle in view.get_throttles():
+        if not throttle.allow_request(request, view):
+            response = exception_handler(Throttled(throttle.wait()), {})
+            response.accepted_renderer = JSONRenderer()
+            response.accepted_media_type = 'application/json'
+            response.renderer_context = {}
+            return response.render()
+    return None
+
+
+def single_flight(key, compute):
+    """Выполняет compute один раз на все одновременные запросы
+    с ключом key во всех воркерах.
+
+    Лидер занимает блокировку в общем кэше (cache.add с таймаутом
+    SINGLE_FLIGHT_LOCK_TIMEOUT - брошенная блокировка истекает сама),
+    остальные ждут его результат не дольше SINGLE_FLIGHT_WAIT секунд.
+    Если лидер снял блокировку, не сохранив ответ (ошибка, не 200), или
+    не успел, ждущие сразу считают сами. Результат хранится
+    SINGLE_FLIGHT_TTL секунд.
+    """
+    cache = caches[settings.SINGLE_FLIGHT_CACHE]
+    cache_key = f'singleflight:{key}'
+    lock_key = f'{cache_key}:lock'
+    entry = cache.get(cache_key)
+    if entry is not None:
+        return shared_response(entry)
+    token = uuid.uuid4().hex
+    if cache.add(lock_key, token, settings.SINGLE_FLIGHT_LOCK_TIMEOUT):
+        try:
+            response = compute()
+            if response.status_code == 200 and not response.streaming:
+                cache.set(cache_key,
+                          (list(response.items()), response.content),
+                          settings.SINGLE_FLIGHT_TTL)
+        finally:
+            if cache.get(lock_key) == token:
+                cache.delete(lock_key)
+        return response
+    deadline = time.monotonic() + settings.SINGLE_FLIGHT_WAIT
+    while time.monotonic() < deadline:
+        time.sleep(POLL_INTERVAL)
+        entry = cache.get(cache_key)
+        if entry is not None:
+            return shared_response(entry)
+        if not cache.has_key(lock_key):
+            entry = cache.get(cache_key)
+            if entry is not None:
+                return shared_response(entry)
+            break
+    return compute()
+
+
+class SingleFlightMiddleware:
+    """Объединение одинаковых одновременных анонимных запросов
+    к рецептам, тегам и ингредиентам (SINGLE_FLIGHT)."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        key = flight_key(request) if settings.SINGLE_FLIGHT else None
+        if key is None:
+            return self.get_response(request)
+        response = single_flight(key, lambda: self.get_response(request))
+        if response.get('X-Single-Flight') == 'shared':
+            return charge_shared(request) or response
+        return response
@@ -0,0 +1,320 @@
+import threading
+from collections import Counter
+from unittest import skipIf
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.db import connection
+from django.db.models.signals import post_init, post_save
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from api import authentication
+from api.fast_serializers import (
+    FastRecipeListSerializer,
+    FastSubscribeListSerializer
+)
+from api.serializers import RecipeListSerializer, SubscribeListSerializer
+from recipes.relations import add_relation, remove_relation
+from recipes.models import (
+    Favorite,
+    Ingredient,
+    IngredientAmount,
+    Recipe,
+    ShoppingCart,
+    Tag
+)
+from users.models import Subscribe, User
+
+
+class LiveTests(TestCase):
+
+    def test_live_does_not_query_database(self):
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('live'))
+        self.assertEqual(response.status_code, 200)
+
+
+@override_settings(AUTH_MODE='jwt')
+class StatelessJWTTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='staff@example.com', username='staff', first_name='Иван',
+            last_name='Иванов', password='password', is_staff=True
+        )
+        self.token = authentication.add_user_claims(
+            RefreshToken.for_user(self.user).access_token, self.user
+        )
+        # Отзыв действует на токены, выданные раньше секунды отзыва.
+        self.token['iat'] -= 1
+        for signal, receiver in ((post_init, authentication.user_loaded),
+                                 (post_save, authentication.user_changed)):
+            signal.connect(receiver, sender=User)
+            self.addCleanup(signal.disconnect, receiver, sender=User)
+        authentication.invalidate_revocations()
+        self.addCleanup(authentication.invalidate_revocations)
+
+    def claims_client(self):
+        client = APIClient()
+        client.force_authenticate(
+            authentication.StatelessJWTAuthentication().get_user(self.token)
+        )
+        return client
+
+    def demote(self):
+        user = User.objects.get(pk=self.user.pk)
+        user.is_staff = False
+        user.save()
+
+    def demote_without_revocation(self):
+        User.objects.filter(pk=self.user.pk).update(is_staff=False)
+
+    def test_saving_claims_user_keeps_demotion(self):
+        self.demote_without_revocation()
+        client = self.claims_client()
+        response = client.patch('/api/users/me/', {'first_name': 'Пётр'})
+        self.assertEqual(response.status_code, 200)
+        user = User.objects.get(pk=self.user.pk)
+        self.assertFalse(user.is_staff)
+        self.assertEqual(user.first_name, 'Пётр')
+        self.assertEqual(client.get(reverse('profiling')).status_code, 403)
+
+    def test_claims_user_reads_privileges_from_database(self):
+        self.demote_without_revocation()
+        response = self.claims_client().get(reverse('profiling'))
+        self.assertEqual(response.status_code, 403)
+
+    def test_privilege_change_revokes_tokens(self):
+        self.assertFalse(authentication.is_revoked(self.token))
+        self.demote()
+        self.assertTrue(authentication.is_revoked(self.token))
+
+
+class FastSerializerTests(TestCase):
+    """Быстрые сериализаторы отдают тот же JSON, что и DRF."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email='reader@example.com', username='reader',
+            first_name='Анна', last_name='Петрова', password='password'
+        )
+        authors = [User.objects.create_user(
+            email=f'author{number}@example.com', username=f'author{number}',
+            first_name='Автор', last_name=str(number), password='password'
+        ) for number in range(2)]
+        tags = [Tag.objects.create(name=f'Тэг {number}', color='#FF0000',
+                                   slug=f'tag{number}')
+                for number in range(3)]
+        ingredients = [Ingredient.objects.create(name=f'Ингредиент {number}',
+                                                 measurement_unit='г')
+                       for number in range(3)]
+        for number in range(4):
+            recipe = Recipe.objects.create(
+                author=authors[number % 2], name=f'Рецепт {number}',
+                text='Текст', cooking_time=number + 1,
+                image=f'recipes/{number}.png'
+            )
+            # Теги добавляются не по порядку id.
+            for tag in reversed(tags[:number % 3 + 1]):
+                recipe.tags.add(tag)
+            for ingredient in ingredients[number % 2:]:
+                IngredientAmount.objects.create(
+                    recipe=recipe, ingredient=ingredient, amount=number + 1
+                )
+            if number % 2:
+                Favorite.objects.create(user=cls.user, recipe=recipe)
+            else:
+                ShoppingCart.objects.create(user=cls.user, recipe=recipe)
+        Subscribe.objects.create(user=cls.user, author=authors[0])
+
+    def setUp(self):
+        cache.clear()
+        request = Request(APIRequestFactory().get('/api/recipes/'))
+        request.user = self.user
+        self.context = {'request': request}
+
+    def assertSameJSON(self, slow, fast):
+        render = JSONRenderer().render
+        self.assertEqual(render(slow), render(fast))
+
+    def test_recipe_list(self):
+        recipes = Recipe.objects.all()
+        for _ in range(2):
+            self.assertSameJSON(
+                RecipeListSerializer(recipes, many=True,
+                                     context=self.context).data,
+                FastRecipeListSerializer(
+                    recipes.values(*FastRecipeListSerializer.fields),
+                    self.context
+                ).data
+            )
+
+    @override_settings(SINGLE_FLIGHT=False)
+    def test_warm_list_reads_documents_from_cache(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        url = reverse('recipe-list')
+        client.get(url)
+        # Количество, страница и флаги пользователя.
+        with self.assertNumQueries(3):
+            client.get(url)
+        recipe = Recipe.objects.first()
+        recipe.name = 'Новое название'
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe.save()
+        names = [result['name'] for result in client.get(url).json()[
+            'results'
+        ]]
+        self.assertIn('Новое название', names)
+
+    def test_subscriptions(self):
+        authors = User.objects.filter(recipes__isnull=False).distinct()
+        self.assertSameJSON(
+            SubscribeListSerializer(authors, many=True,
+                                    context=self.context).data,
+            FastSubscribeListSerializer(
+                authors.values(*FastSubscribeListSerializer.fields),
+                self.context
+            ).data
+        )
+
+
+class SimilarTests(TestCase):
+
+    def test_non_numeric_id(self):
+        response = self.client.get('/api/recipes/abc/similar/')
+        self.assertEqual(response.status_code, 404)
+
+
+@override_settings(SINGLE_FLIGHT=True,
+                   THROTTLE_BUDGETS={'user': 10, 'anon': 1})
+class SingleFlightTests(TestCase):
+
+    def setUp(self):
+        for alias in (settings.SINGLE_FLIGHT_CACHE, settings.THROTTLE_CACHE):
+            caches[alias].clear()
+
+    def test_shared_response_is_throttled(self):
+        url = reverse('tag-list')
+        self.assertEqual(self.client.get(url).status_code, 200)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response)
+
+
+class ToggleTests(TestCase):
+    """Ответы избранного, списка покупок и подписок."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user, cls.author = [User.objects.create_user(
+            email=f'{name}@example.com', username=name, first_name='Имя',
+            last_name='Фамилия', password='password'
+        ) for name in ('user', 'author')]
+        cls.recipe = Recipe.objects.create(
+            author=cls.author, name='Рецепт', text='Текст', cooking_time=1,
+            image='recipes/recipe.png'
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_duplicate_favorite(self):
+        url = f'/api/recipes/{self.recipe.id}/favorite/'
+        self.assertEqual(self.client.post(url).status_code, 201)
+        response = self.client.post(url)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(),
+                         {'non_field_errors': ['Рецепт уже добавлен в '
+                                               'избранное!']})
+
+    def test_unknown_recipe(self):
+        for pk in (self.recipe.id + 1, 'abc'):
+            response = self.client.post(f'/api/recipes/{pk}/shopping_cart/')
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(list(response.json()), ['recipe'])
+
+    def test_delete_missing_relation(self):
+        for action in ('favorite', 'shopping_cart'):
+            response = self.client.delete(
+                f'/api/recipes/{self.recipe.id}/{action}/'
+            )
+            self.assertEqual(response.status_code, 404)
+
+    def test_subscribe_errors(self):
+        for author, message in (
+            (self.user, 'Вы не можете подписаться сами на себя!'),
+            (self.author, 'Вы уже подписаны на этого пользователя'),
+        ):
+            url = f'/api/users/{author.id}/subscribe/'
+            if author == self.author:
+                self.assertEqual(self.client.post(url).status_code, 201)
+            response = self.client.post(url)
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.json(), {'non_field_errors': [message]})
+
+
+@skipIf(connection.vendor == 'sqlite',
+        'SQLite блокирует таблицу целиком на время записи')
+class ToggleRaceTests(TransactionTestCase):
+    """Потоки одновременно добавляют и удаляют одну и ту же связь: ни
+    один запрос не падает, а изменить запись в каждом раунде удаётся
+    ровно одному потоку."""
+
+    threads = 4
+    rounds = 5
+
+    def setUp(self):
+        self.user, self.author = [User.objects.create_user(
+            email=f'{name}@example.com', username=name, first_name='Имя',
+            last_name='Фамилия', password='password'
+        ) for name in ('racer', 'author')]
+        self.recipe = Recipe.objects.create(
+            author=self.author, name='Рецепт', text='Текст', cooking_time=1,
+            image='recipes/recipe.png'
+        )
+
+    def race(self, action, *args):
+        barrier = threading.Barrier(self.threads)
+        results = Counter()
+        lock = threading.Lock()
+
+        def worker():
+            try:
+                barrier.wait()
+                result = bool(action(*args))
+            except Exception as error:
+                result = f'{type(error).__name__}: {error}'
+            finally:
+                connection.close()
+            with lock:
+                results[result] += 1
+
+        threads = [threading.Thread(target=worker)
+                   for _ in range(self.threads)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def test_toggles(self):
+        for model, target_id in ((Favorite, self.recipe.id),
+                                 (ShoppingCart, self.recipe.id),
+                                 (Subscribe, self.author.id)):
+            with self.subTest(model=model.__name__):
+                for _ in range(self.rounds):
+                    for action in (add_relation, remove_relation):
+                        self.assertEqual(
+                            self.race(action, model, self.user.id,
+                                      target_id),
+                            {True: 1, False: self.threads - 1}
+                        )
@@ -0,0 +1,88 @@
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.throttling import BaseThrottle
+
+
+def spend(cache, key, cost, limit, timeout):
+    """Атомарно добавляет cost к счётчику окна (cache.incr); если расход
+    превысил limit, списание откатывается.
+
+    Возвращает новый расход или None, если бюджета не хватило.
+    """
+    cache.add(key, 0, timeout)
+    try:
+        count = cache.incr(key, cost)
+    except ValueError:
+        cache.add(key, 0, timeout)
+        count = cache.incr(key, cost)
+    if count > limit:
+        cache.decr(key, cost)
+        return None
+    return count
+
+
+class CostThrottle(BaseThrottle):
+    """Ограничение запросов с учётом стоимости действия.
+
+    У каждого пользователя (или IP для анонимов) есть бюджет
+    THROTTLE_BUDGETS на окно THROTTLE_WINDOW секунд. Действие списывает
+    из бюджета свой вес из THROTTLE_COSTS, для списков вес растёт
+    вместе с параметром limit. Расход считается скользящим окном
+    из двух соседних счётчиков в кэше THROTTLE_CACHE: списание - атомарный
+    incr, база данных не участвует. С LocMemCache (по умолчанию) бюджет
+    считается в каждом воркере отдельно, общий для всех воркеров кэш
+    (memcached, Redis) делает его общим.
+    """
+
+    def __init__(self):
+        self.wait_seconds = None
+
+    def get_cost(self, request, view):
+        action = getattr(view, 'action', None)
+        cost = settings.THROTTLE_COSTS.get(action, 1)
+        paginator = getattr(view, 'paginator', None)
+        if action == 'list' and paginator is not None:
+            page_size = paginator.get_page_size(request) or 1
+            cost *= max(1, page_size // paginator.page_size)
+        return cost
+
+    def get_scope_and_ident(self, request):
+        if request.user.is_authenticated:
+            return 'user', request.user.pk
+        return 'anon', self.get_ident(request)
+
+    def charge(self, request, cost):
+        """Списывает cost из бюджета клиента, False - бюджета не хватило."""
+        scope, ident = self.get_scope_and_ident(request)
+        budget = settings.THROTTLE_BUDGETS[scope]
+        window = settings.THROTTLE_WINDOW
+        cost = min(cost, budget)
+        current_window, offset = divmod(time.time(), window)
+        current_window = int(current_window)
+        cache = caches[settings.THROTTLE_CACHE]
+        previous_key, current_key = (
+            f'throttle:{scope}:{ident}:{number}'
+            for number in (current_window - 1, current_window)
+        )
+        counters = cache.get_many((previous_key, current_key))
+        previous = counters.get(previous_key, 0)
+        current = counters.get(current_key, 0)
+        fraction = offset / window
+        limit = int(budget - previous * (1 - fraction))
+        if cost <= limit and spend(cache, current_key, cost, limit,
+                                   2 * window) is not None:
+            return True
+        if current + cost > budget or not previous:
+            self.wait_seconds = window - offset
+        else:
+            needed = 1 - (budget - current - cost) / previous
+            self.wait_seconds = max(0, (needed - fraction) * window)
+        return False
+
+    def allow_request(self, request, view):
+        return self.charge(request, self.get_cost(request, view))
+
+    def wait(self):
+        return self.wait_seconds
@@ -1,9 +1,15 @@
+from django.conf import settings
 from django.urls import include, path
 from rest_framework import routers
 
 from .views import (
     IngredientListViewSet,
+    JWTLogoutView,
+    MemorySnapshotView,
+    ProfileFileView,
+    ProfileListView,
     RecipeViewSet,
+    SyncView,
     TagListViewSet,
     UserViewSet
 )
@@ -16,7 +22,19 @@ router.register('tags', TagListViewSet)
 router.register('users', UserViewSet)
 
 urlpatterns = [
+    path('sync/', SyncView.as_view(), name='sync'),
+    path('profiling/', ProfileListView.as_view(), name='profiling'),
+    path('profiling/memory/', MemorySnapshotView.as_view(),
+         name='profiling-memory'),
+    path('profiling/<str:name>/', ProfileFileView.as_view(),
+         name='profiling-file'),
     path('', include(router.urls)),
     path('', include('djoser.urls')),
     path('auth/', include('djoser.urls.authtoken')),
 ]
+
+if settings.AUTH_MODE == 'jwt':
+    urlpatterns += [
+        path('auth/jwt/logout/', JWTLogoutView.as_view(), name='jwt-logout'),
+        path('auth/', include('djoser.urls.jwt')),
+    ]
@@ -1,26 +1,49 @@
+import os
+
+from django.conf import settings
 from django.db.models import Sum
-from django.http import FileResponse
+from django.http import FileResponse, Http404
 from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
+from djoser import utils
 from djoser.views import UserViewSet
 from rest_framework import status
 from rest_framework.decorators import action
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
+from rest_framework.relations import PrimaryKeyRelatedField
 from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+from rest_framework.views import APIView
 from rest_framework.viewsets import ReadOnlyModelViewSet, ModelViewSet
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
 
+from .authentication import revoke_tokens
+from .fast_serializers import (
+    FastRecipeListSerializer,
+    FastShortRecipeSerializer,
+    FastSubscribeListSerializer,
+    sparse_fieldset
+)
+from .idempotency import idempotent
 from .paginations import LimitPagination
-from .filters import IngredientFilter, RecipeFilter
+from .parsers import CSVParser, NDJSONParser
+from .profiling import request_memory_snapshots
+from .filters import (
+    FACET_FILTERS,
+    IngredientFilter,
+    RecipeFilter,
+    recipe_facets
+)
 from .permissions import IsAuthorOrReadOnly, ReadOnly
 from .serializers import (
-    FavoriteSerializer,
     IngredientSerializer,
     ProfileUserSerializer,
     RecipeSerializer,
     RecipeListSerializer,
-    ShoppingCartSerializer,
-    SubscribeListSerializer,
-    SubscribeSerializer,
+    ShortRecipeSerializer,
     TagSerializer
 )
 from recipes.models import (
@@ -31,9 +54,23 @@ from recipes.models import (
     ShoppingCart,
     Tag,
 )
+from recipes.deletion import delete_objects, delete_users_later
+from recipes.feed import read_timeline
+from recipes.importer import RecipeImporter
+from recipes.relations import add_relation, remove_relation
+from recipes.similarity import similar_recipes
+from recipes.sync import changes_since
 from users.models import User, Subscribe
 
 
+def object_id_or_404(value):
+    """id объекта из URL, нечисловой id - 404."""
+    try:
+        return int(value)
+    except ValueError:
+        raise Http404
+
+
 class UserViewSet(UserViewSet):
     """Viewset для подписок."""
 
@@ -46,33 +83,50 @@ class UserViewSet(UserViewSet):
     def subscriptions(self, request):
         user = request.user
         queryset = User.objects.filter(following__user=user)
-        page = self.paginate_queryset(queryset)
-        serializer = SubscribeListSerializer(page,
-                                             many=True,
-                                             context={'request': request})
+        page = self.paginate_queryset(
+            queryset.values(*FastSubscribeListSerializer.fields)
+        )
+        serializer = FastSubscribeListSerializer(page, context={
+            'request': request,
+            **sparse_fieldset(request, FastSubscribeListSerializer),
+        })
         return self.get_paginated_response(serializer.data)
 
+    def perform_destroy(self, instance):
+        if instance == self.request.user:
+            utils.logout_user(self.request)
+        delete_users_later([instance.pk])
+
     @action(methods=['POST', 'DELETE'], detail=True)
+    @idempotent
     def subscribe(self, request, id):
-        user = self.request.user
-        author = get_object_or_404(User, pk=id)
+        author_id = object_id_or_404(id)
         if request.method == 'POST':
-            serializer = SubscribeSerializer(
-                data={'user': user.id, 'author': author.id},
+            if add_relation(Subscribe, request.user.id, author_id) is None:
+                author = get_object_or_404(User, pk=author_id)
+                return Response(
+                    {'non_field_errors': [
+                        'Вы не можете подписаться сами на себя!'
+                        if author == request.user else
+                        'Вы уже подписаны на этого пользователя'
+                    ]},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            serializer = FastSubscribeListSerializer(
+                User.objects.filter(pk=author_id).values(
+                    *FastSubscribeListSerializer.fields
+                ),
                 context={'request': request}
             )
-            serializer.is_valid(raise_exception=True)
-            serializer.save()
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
-        if request.method == 'DELETE':
-            subscription = Subscribe.objects.filter(user=user, author=author)
-            if subscription.exists():
-                subscription.delete()
-                return Response(status=status.HTTP_204_NO_CONTENT)
-            return Response(
-                {'error': 'Вы не подписаны на данного пользователя!'},
-                status=status.HTTP_400_BAD_REQUEST
-            )
+            return Response(serializer.data[0],
+                            status=status.HTTP_201_CREATED)
+        if remove_relation(Subscribe, request.user.id, author_id):
+            return Response(status=status.HTTP_204_NO_CONTENT)
+        get_object_or_404(User, pk=author_id)
+        return Response(
+            {'error': 'Вы не подписаны на данного пользователя!'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
 
 
 class TagListViewSet(ReadOnlyModelViewSet):
@@ -110,46 +164,173 @@ class RecipeViewSet(ModelViewSet):
             return RecipeListSerializer
         return RecipeSerializer
 
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        if self.action in ('list', 'retrieve', 'feed'):
+            context.update(
+                sparse_fieldset(self.request, FastRecipeListSerializer)
+            )
+        return context
+
     def get_permissions(self):
         if self.action in ('list', 'retrieve'):
             return (ReadOnly(),)
         return super().get_permissions()
 
+    def list(self, request, *args, **kwargs):
+        facets = [name for name in request.query_params.get(
+            'facets', ''
+        ).split(',') if name]
+        unknown = ', '.join(sorted(set(facets) - set(FACET_FILTERS)))
+        if unknown:
+            return Response(
+                {'facets': f'Неизвестные фасеты: {unknown}!'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        queryset = self.filter_queryset(self.get_queryset()).values(
+            *FastRecipeListSerializer.fields
+        )
+        page = self.paginate_queryset(queryset)
+        serializer = FastRecipeListSerializer(
+            queryset if page is None else page,
+            context=self.get_serializer_context()
+        )
+        if page is None:
+            response = Response({'results': serializer.data}
+                                if facets else serializer.data)
+        else:
+            response = self.get_paginated_response(serializer.data)
+        if facets:
+            response.data['facets'] = recipe_facets(
+                list(dict.fromkeys(facets)), request.query_params, request
+            )
+        return response
+
+    @idempotent
+    def create(self, request, *args, **kwargs):
+        return super().create(request, *args, **kwargs)
+
+    @idempotent
+    def update(self, request, *args, **kwargs):
+        return super().update(request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        recipe_id = object_id_or_404(kwargs[self.lookup_field])
+        data = FastRecipeListSerializer(
+            [{'id': recipe_id}], context=self.get_serializer_context()
+        ).data
+        if not data:
+            raise Http404
+        return Response(data[0])
+
+    def perform_destroy(self, instance):
+        delete_objects(Recipe, [instance.pk])
+
     @staticmethod
-    def method_for_post_action(request, pk, serializers):
-        data = {'user': request.user.id, 'recipe': pk}
-        serializer = serializers(data=data, context={'request': request})
-        serializer.is_valid(raise_exception=True)
-        serializer.save()
-        return Response(serializer.data, status=status.HTTP_201_CREATED)
+    def method_for_post_action(request, pk, model, message):
+        recipe = PrimaryKeyRelatedField(queryset=Recipe.objects.all())
+        try:
+            recipe_id = int(pk)
+        except ValueError:
+            recipe_id = None
+        if (recipe_id is None
+                or add_relation(model, request.user.id, recipe_id) is None):
+            try:
+                recipe.to_internal_value(pk)
+            except ValidationError as error:
+                return Response({'recipe': error.detail},
+                                status=status.HTTP_400_BAD_REQUEST)
+            return Response({'non_field_errors': [message]},
+                            status=status.HTTP_400_BAD_REQUEST)
+        serializer = FastShortRecipeSerializer(
+            [{'id': recipe_id}], context={'request': request}
+        )
+        return Response(serializer.data[0], status=status.HTTP_201_CREATED)
 
     @staticmethod
     def method_for_delete_action(request, pk, model):
-        recipe = get_object_or_404(Recipe, id=pk)
-        model_instance = get_object_or_404(
-            model, user=request.user, recipe=recipe
-        )
-        model_instance.delete()
+        recipe_id = object_id_or_404(pk)
+        if not remove_relation(model, request.user.id, recipe_id):
+            raise Http404
         return Response(status=status.HTTP_204_NO_CONTENT)
 
     @action(detail=True, methods=['post'])
+    @idempotent
     def favorite(self, request, pk):
-        return self.method_for_post_action(request, pk, FavoriteSerializer)
+        return self.method_for_post_action(
+            request, pk, Favorite, 'Рецепт уже добавлен в избранное!'
+        )
 
     @favorite.mapping.delete
+    @idempotent
     def delete_favorite(self, request, pk):
         return self.method_for_delete_action(request, pk, Favorite)
 
     @action(detail=True, methods=['post'])
+    @idempotent
     def shopping_cart(self, request, pk):
         return self.method_for_post_action(
-            request, pk, ShoppingCartSerializer
+            request, pk, ShoppingCart, 'Рецепт уже добавлен в список покупок!'
         )
 
     @shopping_cart.mapping.delete
+    @idempotent
     def delete_shopping_cart(self, request, pk):
         return self.method_for_delete_action(request, pk, ShoppingCart)
 
+    @action(detail=False, methods=['post'], url_path='import',
+            permission_classes=(IsAdminUser,),
+            parser_classes=(NDJSONParser, CSVParser))
+    def import_recipes(self, request):
+        """Пакетный импорт рецептов из NDJSON или CSV."""
+        created, errors = RecipeImporter(request.user).run(request.data)
+        return Response({
+            'created': created,
+            'errors': [{'line': line_number, 'error': error}
+                       for line_number, error in errors],
+        })
+
+    @action(detail=True, methods=['get'])
+    def similar(self, request, pk):
+        """Рецепты с похожим набором ингредиентов."""
+        recipe = get_object_or_404(Recipe, pk=object_id_or_404(pk))
+        limit = LimitPagination().get_page_size(request)
+        ranked = [recipe_id for recipe_id, _ in similar_recipes(
+            recipe.pk, min(limit, settings.SIMILAR_MAX_RESULTS)
+        )]
+        recipes = Recipe.objects.in_bulk(ranked)
+        serializer = ShortRecipeSerializer(
+            [recipes[recipe_id] for recipe_id in ranked
+             if recipe_id in recipes],
+            many=True,
+            context=self.get_serializer_context()
+        )
+        return Response(serializer.data)
+
+    @action(
+        detail=False, methods=['get'], permission_classes=(IsAuthenticated,)
+    )
+    def feed(self, request):
+        """Лента рецептов авторов из подписок (keyset-пагинация)."""
+        before = request.query_params.get('before')
+        limit = min(LimitPagination().get_page_size(request),
+                    settings.FEED_MAX_PAGE_SIZE)
+        recipe_ids = read_timeline(
+            request.user,
+            before=int(before) if before and before.isdigit() else None,
+            limit=limit
+        )
+        serializer = FastRecipeListSerializer(
+            [{'id': recipe_id} for recipe_id in recipe_ids],
+            context=self.get_serializer_context()
+        )
+        next_url = None
+        if len(recipe_ids) == limit:
+            next_url = replace_query_param(
+                request.build_absolute_uri(), 'before', recipe_ids[-1]
+            )
+        return Response({'next': next_url, 'results': serializer.data})
+
     @action(
         detail=False, methods=['get'], permission_classes=(IsAuthenticated,)
     )
@@ -171,3 +352,120 @@ class RecipeViewSet(ModelViewSet):
                             filename='shopping_cart.txt',
                             status=status.HTTP_200_OK,
                             content_type='text/plain')
+
+
+class SyncView(APIView):
+    """Изменения рецептов, тегов, ингредиентов, избранного, списка покупок
+    и подписок с момента, обозначенного токеном since."""
+
+    def get(self, request):
+        since = request.query_params.get('since', '0')
+        if not since.isdigit():
+            return Response({'since': 'Некорректный токен синхронизации!'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        changes, token, has_more = changes_since(
+            int(since), request.user, settings.SYNC_PAGE_SIZE
+        )
+        rows = [{'id': recipe_id}
+                for recipe_id in changes['recipe']['changed']]
+        context = {'request': request}
+        return Response({
+            'token': str(token),
+            'has_more': has_more,
+            'recipes': {
+                'changed': FastRecipeListSerializer(rows, context).data,
+                'deleted': changes['recipe']['deleted'],
+            },
+            'tags': {
+                'changed': TagSerializer(
+                    Tag.objects.filter(id__in=changes['tag']['changed']),
+                    many=True
+                ).data,
+                'deleted': changes['tag']['deleted'],
+            },
+            'ingredients': {
+                'changed': IngredientSerializer(
+                    Ingredient.objects.filter(
+                        id__in=changes['ingredient']['changed']
+                    ),
+                    many=True
+                ).data,
+                'deleted': changes['ingredient']['deleted'],
+            },
+            'favorites': changes['favorite'],
+            'shopping_cart': changes['cart'],
+            'subscriptions': changes['subscription'],
+        })
+
+
+class ProfileListView(APIView):
+    """Сохранённые профили запросов и снимки памяти процессов."""
+
+    permission_classes = (IsAdminUser,)
+
+    def get(self, request):
+        try:
+            names = sorted(os.listdir(settings.PROFILING_DIR), reverse=True)
+        except FileNotFoundError:
+            names = []
+        return Response([{
+            'name': name,
+            'size': os.path.getsize(os.path.join(settings.PROFILING_DIR,
+                                                 name)),
+        } for name in names])
+
+
+class ProfileFileView(APIView):
+    """Файл профиля: .prof (pstats), .json (отчёт и журнал SQL)
+    или .txt (снимок памяти)."""
+
+    permission_classes = (IsAdminUser,)
+
+    def get(self, request, name):
+        try:
+            names = os.listdir(settings.PROFILING_DIR)
+        except FileNotFoundError:
+            names = []
+        if name not in names:
+            raise Http404
+        return FileResponse(
+            open(os.path.join(settings.PROFILING_DIR, name), 'rb'),
+            as_attachment=name.endswith('.prof'),
+            filename=name
+        )
+
+
+class MemorySnapshotView(APIView):
+    """Снимок tracemalloc: сразу в этом процессе и в остальных
+    процессах - их фоновыми потоками."""
+
+    permission_classes = (IsAdminUser,)
+
+    def post(self, request):
+        name = request_memory_snapshots()
+        if name is None:
+            return Response({'error': 'tracemalloc выключен, задайте '
+                                      'TRACEMALLOC_FRAMES!'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        return Response({'name': name}, status=status.HTTP_202_ACCEPTED)
+
+
+class JWTLogoutView(APIView):
+    """Выход для JWT: отзывает переданный refresh-токен и текущий
+    access-токен."""
+
+    permission_classes = (IsAuthenticated,)
+
+    def post(self, request):
+        try:
+            refresh = RefreshToken(request.data.get('refresh'))
+        except TokenError:
+            return Response({'refresh': 'Некорректный refresh-токен!'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if refresh[jwt_settings.USER_ID_CLAIM] != request.user.pk:
+            return Response({'refresh': 'Токен выдан другому пользователю!'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        revoke_tokens(request.user.pk, refresh)
+        if isinstance(request.auth, AccessToken):
+            revoke_tokens(request.user.pk, request.auth)
+        return Response(status=status.HTTP_204_NO_CONTENT)
@@ -0,0 +1,91 @@
+import logging
+import threading
+import time
+
+from django.db import DatabaseError, connections
+from django.http import HttpResponse, JsonResponse
+from django.urls import get_resolver
+from PIL import Image
+
+from recipes.cache import (
+    ingredient_ids_by_name,
+    sync_generations,
+    tag_ids_by_slug
+)
+from recipes.models import Recipe
+from .fast_serializers import FastRecipeListSerializer
+from .paginations import LimitPagination
+from .serializers import (
+    IngredientSerializer,
+    ProfileUserSerializer,
+    RecipeListSerializer,
+    RecipeSerializer,
+    ShortRecipeSerializer,
+    SubscribeListSerializer,
+    TagSerializer
+)
+
+logger = logging.getLogger('foodgram.warmup')
+
+HOT_SERIALIZERS = (RecipeListSerializer, RecipeSerializer,
+                   ShortRecipeSerializer, SubscribeListSerializer,
+                   TagSerializer, IngredientSerializer, ProfileUserSerializer)
+
+ready = threading.Event()
+warmup_lock = threading.Lock()
+warmup_duration = None
+
+
+def warm_up():
+    """Прогревает процесс до первого запроса.
+
+    Загружает URL-конфигурацию и плагины Pillow, открывает соединения
+    с БД, запоминает поколения кэша, заполняет кэши справочников,
+    строит поля горячих сериализаторов и документы первой страницы
+    рецептов. При ошибке (например, БД ещё недоступна) возвращает
+    False, прогрев повторяется при следующей проверке /ready.
+    """
+    global warmup_duration
+    with warmup_lock:
+        if ready.is_set():
+            return True
+        started = time.perf_counter()
+        try:
+            get_resolver().resolve('/api/recipes/')
+            Image.init()
+            for connection in connections.all():
+                connection.ensure_connection()
+            sync_generations()
+            tag_ids_by_slug()
+            ingredient_ids_by_name()
+            for serializer_class in HOT_SERIALIZERS:
+                serializer_class(context={'request': None}).fields
+            FastRecipeListSerializer(
+                Recipe.objects.values('id')[:LimitPagination.page_size],
+                context={}
+            ).data
+        except Exception:
+            logger.exception('Warm-up failed')
+            return False
+        warmup_duration = time.perf_counter() - started
+        ready.set()
+        logger.info('Warm-up finished in %.3f s', warmup_duration)
+        return True
+
+
+def live_view(request):
+    """Процесс жив и отвечает - без обращения к БД."""
+    return HttpResponse('ok', content_type='text/plain')
+
+
+def ready_view(request):
+    """Процесс прогрет и база данных доступна."""
+    if not warm_up():
+        return JsonResponse({'status': 'warming up'}, status=503)
+    try:
+        with connections['default'].cursor() as cursor:
+            cursor.execute('SELECT 1')
+    except DatabaseError:
+        return JsonResponse({'status': 'database unavailable'}, status=503)
+    return JsonResponse({'status': 'ready',
+                         'warmup_seconds': round(warmup_duration, 3)})
@@ -6,3 +6,7 @@ COLOR_MAX_LENGTH = 7
 SLUG_MAX_LENGTH = 200
 INGREDIENT_NAME = 200
 INGREDIENT_MEASUREMENT_UNIT = 200
+JOB_NAME_MAX_LENGTH = 100
+JOB_KEY_MAX_LENGTH = 200
+IDEMPOTENCY_KEY_MAX_LENGTH = 255
+JTI_MAX_LENGTH = 255
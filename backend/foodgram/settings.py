@@ -1,5 +1,8 @@
 import os
+import sys
+from datetime import timedelta
 
+from django.core.exceptions import ImproperlyConfigured
 from django.core.management.utils import get_random_secret_key
 from pathlib import Path
 
@@ -26,7 +29,8 @@ INSTALLED_APPS = [
     'sorl.thumbnail',
     'api.apps.ApiConfig',
     'users.apps.UsersConfig',
-    'recipes.apps.RecipesConfig'
+    'recipes.apps.RecipesConfig',
+    'jobs.apps.JobsConfig'
 ]
 
 MIDDLEWARE = [
@@ -37,6 +41,11 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'api.profiling.ProfilingMiddleware',
+    'api.middleware.PerformanceMiddleware',
+    'api.nplusone.NPlusOneMiddleware',
+    'api.middleware.CacheCoherenceMiddleware',
+    'api.singleflight.SingleFlightMiddleware',
 ]
 
 ROOT_URLCONF = 'foodgram.urls'
@@ -66,7 +75,8 @@ DATABASES = {
         'USER': os.getenv('POSTGRES_USER', 'postgres'),
         'PASSWORD': os.getenv('POSTGRES_PASSWORD', 'root'),
         'HOST': os.getenv('DB_HOST', 'db'),
-        'PORT': os.getenv('DB_PORT', 5432)
+        'PORT': os.getenv('DB_PORT', 5432),
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', 60))
     }
 }
 
@@ -100,6 +110,7 @@ STATIC_ROOT = BASE_DIR / 'collected_static'
 
 MEDIA_URL = 'media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+ORPHAN_MEDIA_MIN_AGE = int(os.getenv('ORPHAN_MEDIA_MIN_AGE', 3600))
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
@@ -107,18 +118,135 @@ AUTH_USER_MODEL = 'users.User'
 
 DEFAULT_FROM_EMAIL = 'from@example.com'
 
+AUTH_MODE = os.getenv('AUTH_MODE', 'token')
+if AUTH_MODE == 'jwt' and not os.getenv('JWT_SIGNING_KEY'):
+    raise ImproperlyConfigured('Для AUTH_MODE=jwt задайте JWT_SIGNING_KEY, '
+                               'общий для всех воркеров!')
+
+SIMPLE_JWT = {
+    'SIGNING_KEY': os.getenv('JWT_SIGNING_KEY', SECRET_KEY),
+    'ACCESS_TOKEN_LIFETIME': timedelta(
+        minutes=int(os.getenv('JWT_ACCESS_MINUTES', 5))
+    ),
+    'REFRESH_TOKEN_LIFETIME': timedelta(
+        days=int(os.getenv('JWT_REFRESH_DAYS', 1))
+    ),
+    'AUTH_HEADER_TYPES': ('Bearer',),
+    'UPDATE_LAST_LOGIN': False,
+    'TOKEN_OBTAIN_SERIALIZER': 'api.authentication.TokenObtainPairSerializer',
+    'TOKEN_REFRESH_SERIALIZER': 'api.authentication.TokenRefreshSerializer',
+}
+
 REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.AllowAny',
     ),
     'DEFAULT_AUTHENTICATION_CLASSES': (
+        ('api.authentication.StatelessJWTAuthentication',)
+        if AUTH_MODE == 'jwt' else ()
+    ) + (
         'rest_framework.authentication.TokenAuthentication',
     ),
+    'DEFAULT_THROTTLE_CLASSES': (
+        'api.throttling.CostThrottle',
+    ),
     'DEFAULT_PAGINATION_CLASS':
         'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 10,
 }
 
+METRICS_SAMPLE_RATE = float(os.getenv('METRICS_SAMPLE_RATE', 1.0))
+METRICS_ALLOWED_IPS = os.getenv(
+    'METRICS_ALLOWED_IPS', '127.0.0.1'
+).split(',')
+
+NPLUSONE_MODE = os.getenv(
+    'NPLUSONE_MODE', 'raise' if sys.argv[1:2] == ['test'] else 'off'
+)
+NPLUSONE_THRESHOLD = int(os.getenv('NPLUSONE_THRESHOLD', 5))
+
+WARMUP_ON_START = os.getenv('WARMUP_ON_START', 'True') == 'True'
+
+PROFILING_DIR = os.getenv('PROFILING_DIR', '/tmp/foodgram_profiles')
+PROFILING_KEY = os.getenv('PROFILING_KEY', '')
+TRACEMALLOC_FRAMES = int(os.getenv('TRACEMALLOC_FRAMES', 0))
+MEMORY_SNAPSHOT_POLL_INTERVAL = int(
+    os.getenv('MEMORY_SNAPSHOT_POLL_INTERVAL', 5)
+)
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'throttle': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'throttle',
+    },
+    'singleflight': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.getenv('SINGLE_FLIGHT_CACHE_DIR',
+                              '/tmp/foodgram_singleflight'),
+    },
+}
+
+SINGLE_FLIGHT = os.getenv('SINGLE_FLIGHT', 'True') == 'True'
+SINGLE_FLIGHT_CACHE = 'singleflight'
+SINGLE_FLIGHT_TTL = int(os.getenv('SINGLE_FLIGHT_TTL', 5))
+SINGLE_FLIGHT_WAIT = 2
+SINGLE_FLIGHT_LOCK_TIMEOUT = 30
+
+REFERENCE_CACHE_TTL = 300
+GENERATION_SYNC_INTERVAL = int(os.getenv('GENERATION_SYNC_INTERVAL', 1))
+RECIPE_DOCUMENT_TTL = 3600
+
+THROTTLE_CACHE = 'throttle'
+THROTTLE_WINDOW = int(os.getenv('THROTTLE_WINDOW', 60))
+THROTTLE_BUDGETS = {
+    'user': int(os.getenv('THROTTLE_USER_BUDGET', 600)),
+    'anon': int(os.getenv('THROTTLE_ANON_BUDGET', 300)),
+}
+THROTTLE_COSTS = {
+    'list': 1,
+    'retrieve': 1,
+    'create': 10,
+    'update': 10,
+    'partial_update': 10,
+    'destroy': 2,
+    'favorite': 2,
+    'delete_favorite': 2,
+    'shopping_cart': 2,
+    'delete_shopping_cart': 2,
+    'subscribe': 2,
+    'subscriptions': 3,
+    'download_shopping_cart': 20,
+    'feed': 2,
+    'import_recipes': 50,
+}
+
+FEED_FANOUT_LIMIT = int(os.getenv('FEED_FANOUT_LIMIT', 1000))
+FEED_BACKFILL_LIMIT = 100
+FEED_MAX_PAGE_SIZE = 100
+
+SYNC_PAGE_SIZE = 500
+SYNC_SAFETY_WINDOW = 60
+
+DELETE_BATCH_SIZE = int(os.getenv('DELETE_BATCH_SIZE', 1000))
+
+SIMILAR_MAX_RESULTS = 50
+
+IDEMPOTENCY_TTL = int(os.getenv('IDEMPOTENCY_TTL', 24 * 60 * 60))
+IDEMPOTENCY_WAIT = 10
+IDEMPOTENCY_LOCK_TIMEOUT = 60
+
+FACET_TOP_AUTHORS = 10
+FACET_COOKING_TIME_BUCKETS = (15, 30, 60, 120)
+
+JOBS_LOCK_TIMEOUT = 600
+JOBS_RETRY_BACKOFF = 10
+JOBS_CLAIM_BATCH = 10
+JOBS_KEEP_DONE_DAYS = 7
+FEED_POPULAR_AUTHORS_TTL = 300
+
 DJOSER = {
     'LOGIN_FIELD': 'email',
     'PERMISSIONS': {
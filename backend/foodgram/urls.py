@@ -3,9 +3,15 @@ from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import include, path
 
+from api.metrics import metrics_view
+from api.warmup import live_view, ready_view
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('api.urls')),
+    path('metrics', metrics_view, name='metrics'),
+    path('live', live_view, name='live'),
+    path('ready', ready_view, name='ready'),
 ]
 
 if settings.DEBUG:
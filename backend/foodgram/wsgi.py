@@ -1,7 +1,16 @@
 import os
 
+from django.conf import settings
 from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'foodgram.settings')
 
 application = get_wsgi_application()
+
+if settings.WARMUP_ON_START:
+    from api.warmup import warm_up
+    warm_up()
+
+if settings.TRACEMALLOC_FRAMES:
+    from api.profiling import start_tracemalloc
+    start_tracemalloc()
@@ -0,0 +1,17 @@
+from django.contrib import admin
+
+from jobs.models import Job
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('id',
+                    'name',
+                    'queue',
+                    'status',
+                    'attempts',
+                    'run_at',
+                    'finished_at')
+    list_filter = ('queue', 'status', 'name')
+    search_fields = ('name', 'key')
+    readonly_fields = ('created_at', 'locked_at', 'locked_by', 'last_error')
@@ -0,0 +1,55 @@
+import os
+import signal
+import socket
+import time
+
+from django.conf import settings
+from django.core.management import BaseCommand
+from django.db import close_old_connections
+
+from jobs.queue import TASKS, claim, purge_finished, release_stale, run
+
+
+class Command(BaseCommand):
+    """Воркер фоновых задач из очереди в базе данных."""
+
+    def add_arguments(self, parser):
+        parser.add_argument('--queue', action='append', dest='queues',
+                            help='Очередь (можно указать несколько раз), '
+                                 'по умолчанию - все.')
+        parser.add_argument('--sleep', type=float, default=1.0,
+                            help='Пауза, когда очередь пуста (секунды).')
+        parser.add_argument('--burst', action='store_true',
+                            help='Завершиться, когда задачи кончатся.')
+
+    def stop(self, *args):
+        self.running = False
+
+    def handle(self, *args, **options):
+        queues = options['queues'] or sorted(
+            {func.queue for func in TASKS.values()}
+        )
+        worker = f'{socket.gethostname()}:{os.getpid()}'
+        self.running = True
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        self.stdout.write(f'Воркер {worker}, очереди: {", ".join(queues)}')
+        done = failed = 0
+        released_at = 0
+        while self.running:
+            close_old_connections()
+            if time.monotonic() - released_at > settings.JOBS_LOCK_TIMEOUT:
+                release_stale(settings.JOBS_LOCK_TIMEOUT)
+                purge_finished(settings.JOBS_KEEP_DONE_DAYS)
+                released_at = time.monotonic()
+            job = claim(queues, worker)
+            if job is None:
+                if options['burst']:
+                    break
+                time.sleep(options['sleep'])
+                continue
+            if run(job):
+                done += 1
+            else:
+                failed += 1
+        self.stdout.write(f'Выполнено задач: {done}, с ошибкой: {failed}')
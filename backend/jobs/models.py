@@ -0,0 +1,70 @@
+from django.db import models
+from django.utils import timezone
+
+from foodgram.constants import JOB_KEY_MAX_LENGTH, JOB_NAME_MAX_LENGTH
+
+
+class Job(models.Model):
+    """Фоновая задача в очереди, хранящейся в базе данных."""
+
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUSES = (
+        (PENDING, 'В очереди'),
+        (RUNNING, 'Выполняется'),
+        (DONE, 'Выполнена'),
+        (FAILED, 'Ошибка'),
+    )
+
+    queue = models.CharField(verbose_name='Очередь',
+                             max_length=JOB_NAME_MAX_LENGTH,
+                             default='default')
+    name = models.CharField(verbose_name='Задача',
+                            max_length=JOB_NAME_MAX_LENGTH)
+    payload = models.JSONField(verbose_name='Параметры', default=dict)
+    key = models.CharField(verbose_name='Ключ дедупликации',
+                           max_length=JOB_KEY_MAX_LENGTH,
+                           blank=True,
+                           null=True)
+    status = models.CharField(verbose_name='Статус',
+                              max_length=16,
+                              choices=STATUSES,
+                              default=PENDING)
+    attempts = models.PositiveSmallIntegerField(verbose_name='Попыток',
+                                                default=0)
+    max_attempts = models.PositiveSmallIntegerField(
+        verbose_name='Максимум попыток',
+        default=5
+    )
+    run_at = models.DateTimeField(verbose_name='Запустить после',
+                                  default=timezone.now)
+    locked_at = models.DateTimeField(verbose_name='Взята в работу',
+                                     blank=True,
+                                     null=True)
+    locked_by = models.CharField(verbose_name='Воркер',
+                                 max_length=JOB_NAME_MAX_LENGTH,
+                                 blank=True)
+    last_error = models.TextField(verbose_name='Последняя ошибка',
+                                  blank=True)
+    created_at = models.DateTimeField(verbose_name='Создана',
+                                      auto_now_add=True)
+    finished_at = models.DateTimeField(verbose_name='Завершена',
+                                       blank=True,
+                                       null=True)
+
+    class Meta:
+        verbose_name = 'Задача'
+        verbose_name_plural = 'Задачи'
+        ordering = ('run_at', 'id')
+        indexes = [models.Index(fields=['queue', 'status', 'run_at'],
+                                name='job_claim_idx')]
+        constraints = [models.UniqueConstraint(
+            fields=['key'],
+            condition=models.Q(status='pending'),
+            name='unique_pending_job_key'
+        )]
+
+    def __str__(self):
+        return f'{self.name} [{self.queue}] - {self.status}'
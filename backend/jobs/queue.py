@@ -0,0 +1,188 @@
+import logging
+import random
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Count, Min
+from django.utils import timezone
+
+from jobs.models import Job
+
+logger = logging.getLogger('foodgram.jobs')
+
+TASKS = {}
+SUPERSEDED = 'Заменена ожидающей задачей с тем же ключом.'
+
+
+def task(name=None, queue='default', max_attempts=5):
+    """Регистрирует функцию как фоновую задачу.
+
+    Функция получает параметры задачи именованными аргументами.
+    """
+    def register(func):
+        task_name = name or f'{func.__module__}.{func.__name__}'
+        TASKS[task_name] = func
+        func.task_name = task_name
+        func.queue = queue
+        func.max_attempts = max_attempts
+        return func
+    return register
+
+
+def enqueue(func, key=None, delay=None, **payload):
+    """Ставит задачу в очередь.
+
+    Если задача с тем же key уже ждёт в очереди, новая не создаётся
+    и возвращается ожидающая. Выполняющаяся задача с тем же key
+    не мешает: новая встаёт за ней и выполнится после неё, уже
+    с новыми данными.
+    """
+    job = Job(queue=func.queue, name=func.task_name, payload=payload,
+              key=key, max_attempts=func.max_attempts)
+    if delay:
+        job.run_at = timezone.now() + timedelta(seconds=delay)
+    if key is None:
+        job.save()
+        return job
+    try:
+        with transaction.atomic():
+            job.save()
+    except IntegrityError:
+        return Job.objects.filter(key=key, status=Job.PENDING).first()
+    return job
+
+
+def enqueue_many(func, jobs):
+    """Ставит в очередь пачку задач одним запросом.
+
+    jobs - пары (key, payload); задачи с ключами, для которых уже
+    есть ожидающая задача, пропускаются.
+    """
+    Job.objects.bulk_create(
+        (Job(queue=func.queue, name=func.task_name, payload=payload,
+             key=key, max_attempts=func.max_attempts)
+         for key, payload in jobs),
+        batch_size=1000,
+        ignore_conflicts=True
+    )
+
+
+def pending_keys():
+    return Job.objects.filter(status=Job.PENDING,
+                              key__isnull=False).values('key')
+
+
+def release_stale(timeout):
+    """Возвращает в очередь задачи воркеров, которые не ответили.
+
+    Если задача с тем же ключом уже ждёт в очереди, зависшая задача
+    не возвращается, а завершается с ошибкой: её работу выполнит
+    ожидающая.
+    """
+    now = timezone.now()
+    stale = Job.objects.filter(
+        status=Job.RUNNING,
+        locked_at__lt=now - timedelta(seconds=timeout)
+    )
+    with transaction.atomic():
+        stale.filter(key__in=pending_keys()).update(
+            status=Job.FAILED, finished_at=now, locked_at=None,
+            last_error=SUPERSEDED
+        )
+        return stale.update(status=Job.PENDING, locked_at=None,
+                            locked_by='')
+
+
+def purge_finished(days):
+    """Удаляет выполненные задачи старше days дней."""
+    return Job.objects.filter(
+        status=Job.DONE,
+        finished_at__lt=timezone.now() - timedelta(days=days)
+    ).delete()[0]
+
+
+def claim(queues, worker):
+    """Забирает одну готовую к запуску задачу из очередей queues.
+
+    На PostgreSQL строка блокируется SELECT ... FOR UPDATE SKIP LOCKED,
+    на базах без такой поддержки (SQLite) задача захватывается
+    условным UPDATE: выигрывает тот воркер, чей UPDATE изменил строку.
+    Задача не берётся, пока выполняется задача с тем же ключом.
+    """
+    now = timezone.now()
+    candidates = Job.objects.filter(
+        queue__in=queues, status=Job.PENDING, run_at__lte=now
+    ).exclude(key__in=Job.objects.filter(
+        status=Job.RUNNING, key__isnull=False
+    ).values('key')).order_by('run_at', 'id')
+    with transaction.atomic():
+        if connection.features.has_select_for_update_skip_locked:
+            candidates = candidates.select_for_update(skip_locked=True)
+        for job in candidates[:settings.JOBS_CLAIM_BATCH]:
+            claimed = Job.objects.filter(
+                pk=job.pk, status=Job.PENDING
+            ).update(status=Job.RUNNING, locked_at=now, locked_by=worker,
+                     attempts=job.attempts + 1)
+            if claimed:
+                job.status = Job.RUNNING
+                job.attempts += 1
+                return job
+    return None
+
+
+def run(job):
+    """Выполняет задачу, при ошибке планирует повтор с нарастающей паузой."""
+    try:
+        TASKS[job.name](**job.payload)
+    except Exception:
+        job.last_error = traceback.format_exc()
+        if job.attempts < job.max_attempts:
+            backoff = settings.JOBS_RETRY_BACKOFF * 2 ** (job.attempts - 1)
+            job.status = Job.PENDING
+            job.run_at = timezone.now() + timedelta(
+                seconds=backoff * random.uniform(1, 1.5)
+            )
+        else:
+            job.status = Job.FAILED
+            job.finished_at = timezone.now()
+        logger.warning('Job %s (%s) failed, attempt %s', job.pk, job.name,
+                       job.attempts, exc_info=True)
+    else:
+        job.status = Job.DONE
+        job.finished_at = timezone.now()
+    job.locked_at = None
+    fields = ('status', 'run_at', 'locked_at', 'last_error', 'finished_at')
+    try:
+        with transaction.atomic():
+            job.save(update_fields=fields)
+    except IntegrityError:
+        # Повтор не нужен: задача с тем же ключом уже ждёт в очереди.
+        job.status = Job.FAILED
+        job.finished_at = timezone.now()
+        job.last_error += SUPERSEDED
+        job.save(update_fields=fields)
+    return job.status == Job.DONE
+
+
+def queue_metrics():
+    """Метрики очередей в формате Prometheus."""
+    lines = ['# HELP foodgram_jobs Задачи по очередям и статусам.',
+             '# TYPE foodgram_jobs gauge']
+    for row in Job.objects.values('queue', 'status').annotate(
+        count=Count('id')
+    ).order_by('queue', 'status'):
+        lines.append(f'foodgram_jobs{{queue="{row["queue"]}",'
+                     f'status="{row["status"]}"}} {row["count"]}')
+    lines += ['# HELP foodgram_jobs_oldest_pending_seconds '
+              'Возраст самой старой ожидающей задачи.',
+              '# TYPE foodgram_jobs_oldest_pending_seconds gauge']
+    now = timezone.now()
+    for row in Job.objects.filter(
+        status=Job.PENDING, run_at__lte=now
+    ).values('queue').annotate(oldest=Min('run_at')).order_by('queue'):
+        age = (now - row['oldest']).total_seconds()
+        lines.append(f'foodgram_jobs_oldest_pending_seconds'
+                     f'{{queue="{row["queue"]}"}} {age:.1f}')
+    return lines
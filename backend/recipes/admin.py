@@ -2,6 +2,7 @@ from django import forms
 from django.contrib import admin
 
 
+from recipes.deletion import delete_objects
 from recipes.models import (
     Favorite,
     Ingredient,
@@ -12,6 +13,29 @@ from recipes.models import (
 )
 
 
+class BulkDeleteMixin:
+    """Удаление через delete_objects вместо коллектора Django.
+
+    Страница подтверждения перечисляет только выбранные объекты,
+    не загружая все связанные с ними строки.
+    """
+
+    def get_deleted_objects(self, objs, request):
+        objs = list(objs)
+        opts = self.model._meta
+        perms_needed = (set() if self.has_delete_permission(request)
+                        else {opts.verbose_name})
+        return ([str(obj) for obj in objs],
+                {opts.verbose_name_plural: len(objs)}, perms_needed, [])
+
+    def delete_model(self, request, obj):
+        delete_objects(self.model, [obj.pk])
+
+    def delete_queryset(self, request, queryset):
+        delete_objects(self.model,
+                       list(queryset.values_list('pk', flat=True)))
+
+
 @admin.register(Favorite)
 class FavoriteAdmin(admin.ModelAdmin):
     list_display = ('user',
@@ -51,7 +75,7 @@ class RecipeForm(forms.ModelForm):
 
 
 @admin.register(Recipe)
-class RecipeAdmin(admin.ModelAdmin):
+class RecipeAdmin(BulkDeleteMixin, admin.ModelAdmin):
     form = RecipeForm
     list_display = ('pub_date',
                     'author',
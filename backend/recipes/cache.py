@@ -0,0 +1,158 @@
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+
+from recipes.models import CacheGeneration, Ingredient, Tag
+
+TAG_SLUGS_CACHE_KEY = 'reference:tag_slugs'
+INGREDIENTS_CACHE_KEY = 'reference:ingredients'
+RECIPE_DOCUMENTS_VERSION_KEY = 'recipe_documents:version'
+
+
+def tag_ids_by_slug():
+    """Словарь {slug: id} всех тегов из кэша процесса."""
+    slugs = cache.get(TAG_SLUGS_CACHE_KEY)
+    if slugs is None:
+        slugs = dict(Tag.objects.values_list('slug', 'id'))
+        cache.set(TAG_SLUGS_CACHE_KEY, slugs, settings.REFERENCE_CACHE_TTL)
+    return slugs
+
+
+def tag_slug_choices():
+    return [(slug, slug) for slug in tag_ids_by_slug()]
+
+
+def invalidate_tags():
+    cache.delete(TAG_SLUGS_CACHE_KEY)
+
+
+def ingredient_ids_by_name():
+    """Словарь {(название, единица измерения): id} всех ингредиентов."""
+    ingredients = cache.get(INGREDIENTS_CACHE_KEY)
+    if ingredients is None:
+        ingredients = {
+            (name, unit): ingredient_id
+            for ingredient_id, name, unit in Ingredient.objects.values_list(
+                'id', 'name', 'measurement_unit'
+            )
+        }
+        cache.set(INGREDIENTS_CACHE_KEY, ingredients,
+                  settings.REFERENCE_CACHE_TTL)
+    return ingredients
+
+
+def invalidate_ingredients():
+    cache.delete(INGREDIENTS_CACHE_KEY)
+
+
+def new_stamp(key):
+    """Отметка-токен для key, если её нет в кэше (cache.add: из двух
+    одновременных запросов записывает только один)."""
+    stamp = uuid.uuid4().hex
+    if cache.add(key, stamp, None):
+        return stamp
+    return cache.get(key, stamp)
+
+
+def cached_recipe_documents(recipe_ids):
+    """Документы рецептов из кэша одним get_many.
+
+    Документ хранится вместе с отметками (версия всех документов,
+    отметка рецепта), с которыми он был собран, и читается, только если
+    они совпадают с текущими. Возвращает {id: документ} найденных
+    и {id: отметки} для сохранения недостающих.
+    """
+    keys = {recipe_id: (f'recipe_documents:{recipe_id}',
+                        f'recipe_documents:stamp:{recipe_id}')
+            for recipe_id in recipe_ids}
+    cached = cache.get_many([RECIPE_DOCUMENTS_VERSION_KEY,
+                             *(key for pair in keys.values() for key in pair)])
+    version = (cached.get(RECIPE_DOCUMENTS_VERSION_KEY)
+               or new_stamp(RECIPE_DOCUMENTS_VERSION_KEY))
+    documents, stamps = {}, {}
+    for recipe_id, (document_key, stamp_key) in keys.items():
+        stamps[recipe_id] = (version,
+                             cached.get(stamp_key) or new_stamp(stamp_key))
+        entry = cached.get(document_key)
+        if entry is not None and entry[0] == stamps[recipe_id]:
+            documents[recipe_id] = entry[1]
+    return documents, stamps
+
+
+def store_recipe_documents(documents, stamps):
+    cache.set_many({
+        f'recipe_documents:{recipe_id}': (stamps[recipe_id], document)
+        for recipe_id, document in documents.items()
+    }, settings.RECIPE_DOCUMENT_TTL)
+
+
+def invalidate_recipe_documents(recipe_ids):
+    """Новые отметки рецептов: сохранённые документы больше не читаются.
+
+    Вызывается после коммита, поэтому документ, собранный с новой
+    отметкой, уже видит изменения.
+    """
+    cache.set_many({f'recipe_documents:stamp:{recipe_id}': uuid.uuid4().hex
+                    for recipe_id in recipe_ids}, None)
+
+
+def invalidate_all_recipe_documents():
+    """Сбрасывает все документы разом (смена тега или ингредиента,
+    изменение рецептов в другом процессе)."""
+    cache.set(RECIPE_DOCUMENTS_VERSION_KEY, uuid.uuid4().hex, None)
+
+
+GENERATION_INVALIDATORS = {
+    'tag': (invalidate_tags, invalidate_all_recipe_documents),
+    'ingredient': (invalidate_ingredients, invalidate_all_recipe_documents),
+    'recipe': (invalidate_all_recipe_documents,),
+}
+local_generations = {}
+last_sync = None
+
+
+def bump_generation(family):
+    """Увеличивает счётчик поколения семейства моделей.
+
+    Если с прошлой сверки счётчик менял только этот процесс, свои
+    записи он уже сбросил точечно и новое значение запоминается сразу.
+    Возвращает новое значение.
+    """
+    table = connection.ops.quote_name(CacheGeneration._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {table} (family, value) VALUES (%s, 1) '
+            f'ON CONFLICT (family) DO UPDATE SET value = {table}.value + 1 '
+            f'RETURNING value',
+            [family]
+        )
+        value = cursor.fetchone()[0]
+    if local_generations.get(family) == value - 1:
+        local_generations[family] = value
+    return value
+
+
+def sync_generations():
+    """Сверяет счётчики поколений с базой одним запросом и сбрасывает
+    локальные кэши семейств, изменённых другими процессами."""
+    global last_sync
+    last_sync = time.monotonic()
+    for family, value in CacheGeneration.objects.values_list('family',
+                                                             'value'):
+        if local_generations.get(family) != value:
+            local_generations[family] = value
+            for invalidate in GENERATION_INVALIDATORS.get(family, ()):
+                invalidate()
+
+
+def sync_generations_if_due():
+    """Сверка поколений не чаще раза в GENERATION_SYNC_INTERVAL секунд:
+    изменения других процессов видны с этой задержкой, зато запрос
+    не тратит на сверку отдельный SELECT."""
+    if (last_sync is None
+            or time.monotonic() - last_sync
+            >= settings.GENERATION_SYNC_INTERVAL):
+        sync_generations()
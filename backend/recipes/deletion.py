@@ -0,0 +1,147 @@
+import itertools
+import os
+import time
+
+from django.apps import apps
+from django.conf import settings
+from django.db import transaction
+from django.db.models import CASCADE, DO_NOTHING, SET_NULL
+from django.db.models.deletion import get_candidate_relations_to_delete
+from rest_framework.authtoken.models import Token
+
+from api.authentication import revoke_tokens
+from jobs.queue import enqueue, task
+from recipes.cache import bump_generation
+from recipes.feed import authors_unfollowed
+from recipes.models import Favorite, Recipe, ShoppingCart
+from recipes.signals import GENERATION_SENDERS, SYNC_SENDERS
+from recipes.sync import record_deletions
+from users.models import Subscribe, User
+
+
+def chunks(values, size):
+    iterator = iter(values)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def delete_unused_images(names):
+    """Удаляет файлы изображений, на которые больше не ссылаются рецепты
+    (одинаковые изображения хранятся одним файлом).
+
+    Файлы моложе ORPHAN_MEDIA_MIN_AGE не удаляются: их могла только что
+    повторно использовать ещё не закоммиченная транзакция. Такие файлы
+    позже удалит collectorphanmedia.
+    """
+    storage = Recipe._meta.get_field('image').storage
+    used = set(Recipe.objects.filter(image__in=names).values_list(
+        'image', flat=True
+    ))
+    deadline = time.time() - settings.ORPHAN_MEDIA_MIN_AGE
+    for name in names - used:
+        try:
+            if os.path.getmtime(storage.path(name)) <= deadline:
+                storage.delete(name)
+        except FileNotFoundError:
+            pass
+
+
+def recipes_deleting(queryset):
+    recipes = list(queryset.values_list('id', 'image'))
+    recipe_ids = [recipe_id for recipe_id, _ in recipes]
+    images = {image for _, image in recipes if image}
+    record_deletions('recipe', ((recipe_id, 0) for recipe_id in recipe_ids))
+    transaction.on_commit(lambda: delete_unused_images(images))
+
+
+def subscriptions_deleting(queryset):
+    subscriptions = list(queryset.values_list('author_id', 'user_id'))
+    record_deletions('subscription', subscriptions)
+    transaction.on_commit(lambda: authors_unfollowed(
+        {author_id for author_id, _ in subscriptions}
+    ))
+
+
+def user_objects_deleting(queryset):
+    model, object_field, user_field = SYNC_SENDERS[queryset.model]
+    record_deletions(model, queryset.values_list(object_field, user_field))
+
+
+BEFORE_DELETE = {
+    Recipe: recipes_deleting,
+    Subscribe: subscriptions_deleting,
+    Favorite: user_objects_deleting,
+    ShoppingCart: user_objects_deleting,
+}
+
+
+def delete_chunk(model, pks):
+    """Удаляет строки model с ключами pks в одной транзакции: сначала
+    зависимые строки всех моделей со ссылками на model, затем сами
+    строки."""
+    with transaction.atomic():
+        for relation in get_candidate_relations_to_delete(model._meta):
+            rows = relation.related_model._base_manager.filter(
+                **{f'{relation.field.name}__in': pks}
+            )
+            if relation.on_delete is CASCADE:
+                delete_rows(relation.related_model, rows)
+            elif relation.on_delete is SET_NULL:
+                rows.update(**{relation.field.name: None})
+            elif relation.on_delete is not DO_NOTHING:
+                raise ValueError(f'Удаление {relation} с on_delete='
+                                 f'{relation.on_delete.__name__} '
+                                 f'не поддерживается!')
+        queryset = model._base_manager.filter(pk__in=pks)
+        if model in BEFORE_DELETE:
+            BEFORE_DELETE[model](queryset)
+        queryset._raw_delete(queryset.db)
+        if model in GENERATION_SENDERS:
+            family = GENERATION_SENDERS[model]
+            transaction.on_commit(lambda: bump_generation(family))
+
+
+def delete_rows(model, queryset):
+    """Удаляет строки queryset пачками по DELETE_BATCH_SIZE."""
+    while True:
+        pks = list(queryset.order_by().values_list('pk', flat=True)[
+            :settings.DELETE_BATCH_SIZE
+        ])
+        if not pks:
+            return
+        delete_chunk(model, pks)
+
+
+def delete_objects(model, pks):
+    """Каскадное удаление объектов без коллектора Django.
+
+    Связанные строки удаляются set-based запросами DELETE ... WHERE
+    pk IN (...) в порядке зависимостей, пачками по DELETE_BATCH_SIZE,
+    поэтому в память загружаются только ключи одной пачки. Сигналы
+    моделей не отправляются: журнал синхронизации, кэш документов,
+    поколения кэша и файлы изображений обрабатываются здесь же.
+    Каждая пачка - отдельная транзакция; прерванное удаление
+    безопасно повторить.
+    """
+    for chunk in chunks(pks, settings.DELETE_BATCH_SIZE):
+        delete_chunk(model, chunk)
+
+
+@task(queue='default')
+def cascade_delete(model, pks):
+    delete_objects(apps.get_model(model), pks)
+
+
+def delete_users_later(user_ids):
+    """Сразу блокирует пользователей и отзывает их токены, а данные
+    удаляет фоновой задачей - время запроса не зависит от их объёма."""
+    user_ids = list(user_ids)
+    with transaction.atomic():
+        User.objects.filter(pk__in=user_ids).update(is_active=False)
+        Token.objects.filter(user_id__in=user_ids).delete()
+        for user_id in user_ids:
+            revoke_tokens(user_id)
+        enqueue(cascade_delete, model=User._meta.label_lower, pks=user_ids)
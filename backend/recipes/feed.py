@@ -0,0 +1,130 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count
+
+from jobs.queue import enqueue, task
+from recipes.models import Recipe, Timeline
+from users.models import Subscribe
+
+POPULAR_AUTHORS_CACHE_KEY = 'feed:popular_authors'
+
+
+def popular_author_ids():
+    """Авторы, у которых подписчиков больше FEED_FANOUT_LIMIT.
+
+    Их рецепты не раскладываются по лентам, а подтягиваются при чтении.
+    """
+    author_ids = cache.get(POPULAR_AUTHORS_CACHE_KEY)
+    if author_ids is None:
+        author_ids = frozenset(
+            Subscribe.objects
+            .values('author')
+            .annotate(followers=Count('id'))
+            .filter(followers__gt=settings.FEED_FANOUT_LIMIT)
+            .values_list('author', flat=True)
+        )
+        cache.set(POPULAR_AUTHORS_CACHE_KEY, author_ids,
+                  settings.FEED_POPULAR_AUTHORS_TTL)
+    return author_ids
+
+
+def is_popular(author_id):
+    """Точная проверка по числу подписчиков, без кэша."""
+    return Subscribe.objects.filter(
+        author_id=author_id
+    ).count() > settings.FEED_FANOUT_LIMIT
+
+
+def fan_out(author_id, recipe_ids):
+    follower_ids = Subscribe.objects.filter(
+        author_id=author_id
+    ).values_list('user_id', flat=True)
+    Timeline.objects.bulk_create(
+        (Timeline(user_id=user_id, author_id=author_id, recipe_id=recipe_id)
+         for user_id in follower_ids.iterator()
+         for recipe_id in recipe_ids),
+        batch_size=1000,
+        ignore_conflicts=True
+    )
+
+
+@task(queue='feed')
+def fan_out_recipe(recipe_id, author_id):
+    """Добавляет новый рецепт в ленты подписчиков автора."""
+    if (is_popular(author_id)
+            or not Recipe.objects.filter(pk=recipe_id).exists()):
+        return
+    fan_out(author_id, [recipe_id])
+
+
+@task(queue='feed')
+def catch_up_followers(author_id):
+    """Раскладывает по лентам подписчиков последние рецепты автора,
+    который перестал быть популярным.
+
+    Пока автор был популярным, его рецепты не попадали в ленты,
+    а подтягивались при чтении; после этого чтение их больше не
+    подтягивает.
+    """
+    if is_popular(author_id):
+        return
+    fan_out(author_id, list(
+        Recipe.objects.filter(author_id=author_id)
+        .order_by('-id').values_list('id', flat=True)
+        [:settings.FEED_BACKFILL_LIMIT]
+    ))
+    cache.delete(POPULAR_AUTHORS_CACHE_KEY)
+
+
+def authors_unfollowed(author_ids):
+    """Ставит в очередь заполнение лент для авторов, которые после
+    отписок опустились до FEED_FANOUT_LIMIT подписчиков."""
+    popular = popular_author_ids()
+    for author_id in set(author_ids) & popular:
+        if not is_popular(author_id):
+            enqueue(catch_up_followers,
+                    key=f'catch_up_followers:{author_id}',
+                    author_id=author_id)
+
+
+def backfill_timeline(user_id, author_id):
+    """Добавляет в ленту последние рецепты автора после подписки."""
+    if author_id in popular_author_ids():
+        return
+    recipe_ids = Recipe.objects.filter(
+        author_id=author_id
+    ).order_by('-id').values_list('id', flat=True)
+    Timeline.objects.bulk_create(
+        (Timeline(user_id=user_id, author_id=author_id, recipe_id=recipe_id)
+         for recipe_id in recipe_ids[:settings.FEED_BACKFILL_LIMIT]),
+        ignore_conflicts=True
+    )
+
+
+def prune_timeline(user_id, author_id):
+    """Убирает из ленты рецепты автора после отписки."""
+    Timeline.objects.filter(user_id=user_id, author_id=author_id).delete()
+
+
+def read_timeline(user, before=None, limit=6):
+    """id рецептов ленты пользователя по убыванию, строго меньше before.
+
+    Записи ленты объединяются с последними рецептами популярных
+    авторов, на которых подписан пользователь.
+    """
+    timeline = Timeline.objects.filter(user=user)
+    pulled = Recipe.objects.filter(
+        author_id__in=popular_author_ids(),
+        author__following__user=user
+    )
+    if before is not None:
+        timeline = timeline.filter(recipe_id__lt=before)
+        pulled = pulled.filter(id__lt=before)
+    recipe_ids = set(
+        timeline.order_by('-recipe_id')
+        .values_list('recipe_id', flat=True)[:limit]
+    )
+    recipe_ids.update(
+        pulled.order_by('-id').values_list('id', flat=True)[:limit]
+    )
+    return sorted(recipe_ids, reverse=True)[:limit]
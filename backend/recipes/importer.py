@@ -0,0 +1,303 @@
+import base64
+import binascii
+import csv
+import io
+import itertools
+import json
+
+from django.core.exceptions import SuspiciousFileOperation, ValidationError
+from django.core.files.base import ContentFile
+from django.db import DatabaseError, connection, transaction
+from PIL import Image, UnidentifiedImageError
+from rest_framework.exceptions import ValidationError as APIValidationError
+
+from jobs.queue import enqueue_many
+from recipes.cache import ingredient_ids_by_name, tag_ids_by_slug
+from recipes.deletion import delete_unused_images
+from recipes.feed import fan_out_recipe
+from recipes.models import Change, IngredientAmount, Recipe
+from recipes.similarity import update_similarity_index
+from users.models import User
+
+CSV_FIELDS = ('recipe', 'name', 'text', 'cooking_time', 'tags', 'image',
+              'author', 'ingredient', 'measurement_unit', 'amount')
+CSV_OPTIONAL_FIELDS = ('author',)
+ENCODING_ERROR = 'Некорректная кодировка строки!'
+
+
+class RecordError(Exception):
+    """Ошибка в отдельной записи импорта."""
+
+
+class FormatError(Exception):
+    """Файл импорта нельзя прочитать целиком (например, в CSV нет
+    обязательных колонок)."""
+
+
+def decode_lines(stream, encoding, bad_lines):
+    """Строки бинарного потока, декодированные по одной: строка
+    в неверной кодировке заменяется символами-заменителями, её номер
+    добавляется в bad_lines."""
+    for line_number, line in enumerate(stream, 1):
+        try:
+            yield line.decode(encoding)
+        except UnicodeDecodeError:
+            bad_lines.add(line_number)
+            yield line.decode(encoding, 'replace')
+
+
+def read_ndjson(stream, encoding='utf-8'):
+    """Записи из NDJSON: один рецепт в формате JSON на строку."""
+    bad_lines = set()
+    for line_number, line in enumerate(
+        decode_lines(stream, encoding, bad_lines), 1
+    ):
+        if line_number in bad_lines:
+            yield line_number, RecordError(ENCODING_ERROR)
+            continue
+        if not line.strip():
+            continue
+        try:
+            yield line_number, json.loads(line)
+        except ValueError as error:
+            yield line_number, RecordError(f'Некорректный JSON: {error}')
+
+
+def read_csv(stream, encoding='utf-8'):
+    """Записи из CSV с заголовком CSV_FIELDS.
+
+    Каждая строка - один ингредиент; идущие подряд строки с одинаковым
+    значением recipe образуют рецепт, остальные поля рецепта берутся
+    из первой строки, теги перечисляются через запятую. Заголовок
+    проверяется сразу: без обязательных колонок - FormatError.
+    """
+    bad_lines = set()
+    reader = csv.DictReader(decode_lines(stream, encoding, bad_lines))
+    missing = [field for field in CSV_FIELDS
+               if field not in (reader.fieldnames or ())
+               and field not in CSV_OPTIONAL_FIELDS]
+    if missing:
+        raise FormatError(f'В заголовке CSV нет колонок: '
+                          f'{", ".join(missing)}!')
+    return csv_records(reader, bad_lines)
+
+
+def csv_records(reader, bad_lines):
+    rows = ((reader.line_num, row) for row in reader)
+    for _, group in itertools.groupby(rows,
+                                      key=lambda item: item[1]['recipe']):
+        group = list(group)
+        line_number, first = group[0]
+        bad_line = next((number for number, _ in group
+                         if number in bad_lines), None)
+        if bad_line is not None:
+            yield bad_line, RecordError(ENCODING_ERROR)
+            continue
+        yield line_number, {
+            'name': first['name'],
+            'text': first['text'],
+            'cooking_time': first['cooking_time'],
+            'tags': [slug.strip() for slug in (first['tags'] or '').split(',')
+                     if slug.strip()],
+            'image': first['image'],
+            'author': first.get('author') or None,
+            'ingredients': [{
+                'name': row['ingredient'],
+                'measurement_unit': row['measurement_unit'],
+                'amount': row['amount'],
+            } for _, row in group],
+        }
+
+
+class RecipeImporter:
+    """Пакетный импорт рецептов.
+
+    Записи проверяются по одной, ингредиенты и теги сопоставляются
+    по кэшированным справочникам, а рецепты, их ингредиенты, теги,
+    журнал синхронизации и фоновые задачи вставляются пачками по
+    batch_size в одной транзакции. Ошибочные записи попадают в errors
+    и не прерывают импорт; загруженные для них изображения удаляются
+    через delete_unused_images (с учётом ORPHAN_MEDIA_MIN_AGE).
+    """
+
+    def __init__(self, author=None, batch_size=500):
+        self.default_author = author
+        self.batch_size = batch_size
+        self.storage = Recipe._meta.get_field('image').storage
+        self.author_ids = {}
+        self.uploaded = set()
+        self.created = 0
+        self.errors = []
+
+    def run(self, records):
+        batch = []
+        for line_number, record in records:
+            try:
+                batch.append((line_number, self.prepare(record)))
+            except RecordError as error:
+                self.errors.append((line_number, str(error)))
+            if len(batch) >= self.batch_size:
+                self.flush(batch)
+                batch = []
+        if batch:
+            self.flush(batch)
+        self.errors.sort()
+        if self.uploaded:
+            delete_unused_images(self.uploaded)
+        return self.created, self.errors
+
+    @staticmethod
+    def clean_field(model, name, value):
+        field = model._meta.get_field(name)
+        try:
+            return field.clean(value, None)
+        except ValidationError as error:
+            messages = error.messages
+        except APIValidationError as error:
+            messages = [str(message) for message in error.detail]
+        raise RecordError(f'{field.verbose_name}: {" ".join(messages)}')
+
+    def save_image(self, value):
+        if not value or not isinstance(value, str):
+            raise RecordError('Не передано изображение!')
+        if not value.startswith('data:'):
+            try:
+                if self.storage.exists(value):
+                    return value
+            except SuspiciousFileOperation:
+                pass
+            raise RecordError(f'Файл изображения {value} не найден!')
+        try:
+            content = base64.b64decode(value.partition(';base64,')[2],
+                                       validate=True)
+            image = Image.open(io.BytesIO(content))
+            extension = image.format.lower()
+            image.verify()
+        except (binascii.Error, UnidentifiedImageError, OSError):
+            raise RecordError('Некорректное изображение!')
+        name = self.storage.save(f'recipes/import.{extension}',
+                                 ContentFile(content))
+        self.uploaded.add(name)
+        return name
+
+    def prepare(self, record):
+        """Проверяет запись и возвращает данные для вставки."""
+        if isinstance(record, RecordError):
+            raise record
+        if not isinstance(record, dict):
+            raise RecordError('Запись должна быть объектом!')
+        tags = record.get('tags')
+        if (not tags or not isinstance(tags, list)
+                or not all(isinstance(slug, str) for slug in tags)):
+            raise RecordError('Нужно выбрать хотя бы один тег!')
+        if len(tags) != len(set(tags)):
+            raise RecordError('Теги не уникальны!')
+        tag_ids = tag_ids_by_slug()
+        unknown = [slug for slug in tags if slug not in tag_ids]
+        if unknown:
+            raise RecordError(f'Неизвестные теги: {", ".join(unknown)}!')
+        ingredients = record.get('ingredients')
+        if not ingredients or not isinstance(ingredients, list):
+            raise RecordError('Необходимо выбрать хотя бы один ингредиент!')
+        ingredient_ids = ingredient_ids_by_name()
+        amounts = {}
+        for ingredient in ingredients:
+            if not isinstance(ingredient, dict):
+                raise RecordError('Ингредиент должен быть объектом!')
+            key = (ingredient.get('name'), ingredient.get('measurement_unit'))
+            if key not in ingredient_ids:
+                raise RecordError(f'Неизвестный ингредиент: {key[0]}, '
+                                  f'{key[1]}!')
+            if ingredient_ids[key] in amounts:
+                raise RecordError('Ингредиенты не должны повторяться!')
+            amounts[ingredient_ids[key]] = self.clean_field(
+                IngredientAmount, 'amount', ingredient.get('amount')
+            )
+        return {
+            'author': record.get('author'),
+            'fields': {
+                name: self.clean_field(Recipe, name, record.get(name))
+                for name in ('name', 'text', 'cooking_time')
+            },
+            'tag_ids': [tag_ids[slug] for slug in tags],
+            'amounts': amounts,
+            'image': self.save_image(record.get('image')),
+        }
+
+    def resolve_authors(self, batch):
+        emails = {item['author'] for _, item in batch
+                  if item['author'] and item['author'] not in self.author_ids}
+        if emails:
+            self.author_ids.update(User.objects.filter(
+                email__in=emails
+            ).values_list('email', 'id'))
+        resolved = []
+        for line_number, item in batch:
+            if item['author']:
+                author_id = self.author_ids.get(item['author'])
+            else:
+                author_id = getattr(self.default_author, 'pk', None)
+            if author_id is None:
+                self.errors.append((line_number, (
+                    f'Автор {item["author"]} не найден!' if item['author']
+                    else 'Не указан автор рецепта!'
+                )))
+                continue
+            resolved.append((line_number, {**item, 'author_id': author_id}))
+        return resolved
+
+    def insert(self, items):
+        """Вставляет рецепты пачкой. Сигналы не отправляются, поэтому
+        журнал изменений и фоновые задачи создаются здесь же."""
+        recipes = [Recipe(author_id=item['author_id'], image=item['image'],
+                          **item['fields']) for item in items]
+        with transaction.atomic():
+            Recipe.objects.bulk_create(recipes)
+            if not connection.features.can_return_rows_from_bulk_insert:
+                # SQLite: запись в базу держит блокировку до конца
+                # транзакции, поэтому последние id - только что
+                # вставленные рецепты.
+                recipe_ids = list(Recipe.objects.order_by('-id').values_list(
+                    'id', flat=True
+                )[:len(recipes)])
+                for recipe, recipe_id in zip(recipes,
+                                             reversed(recipe_ids)):
+                    recipe.pk = recipe_id
+            IngredientAmount.objects.bulk_create(
+                IngredientAmount(recipe=recipe, ingredient_id=ingredient_id,
+                                 amount=amount)
+                for recipe, item in zip(recipes, items)
+                for ingredient_id, amount in item['amounts'].items()
+            )
+            Recipe.tags.through.objects.bulk_create(
+                Recipe.tags.through(recipe_id=recipe.pk, tag_id=tag_id)
+                for recipe, item in zip(recipes, items)
+                for tag_id in item['tag_ids']
+            )
+            Change.objects.bulk_create(
+                Change(model='recipe', object_id=recipe.pk)
+                for recipe in recipes
+            )
+            enqueue_many(fan_out_recipe, (
+                (f'fan_out_recipe:{recipe.pk}',
+                 {'recipe_id': recipe.pk, 'author_id': recipe.author_id})
+                for recipe in recipes
+            ))
+            enqueue_many(update_similarity_index, (
+                (f'similarity:{recipe.pk}', {'recipe_id': recipe.pk})
+                for recipe in recipes
+            ))
+        self.created += len(recipes)
+
+    def flush(self, batch):
+        batch = self.resolve_authors(batch)
+        if not batch:
+            return
+        try:
+            self.insert([item for _, item in batch])
+        except DatabaseError:
+            for line_number, item in batch:
+                try:
+                    self.insert([item])
+                except DatabaseError as error:
+                    self.errors.append((line_number, str(error)))
@@ -0,0 +1,51 @@
+import time
+
+from django.core.management import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIRequestFactory
+
+from api.authentication import (
+    StatelessJWTAuthentication,
+    TokenObtainPairSerializer
+)
+from users.models import User
+
+
+class Command(BaseCommand):
+    """Замер накладных расходов аутентификации одного запроса:
+    DRF TokenAuthentication против JWT без обращения к БД."""
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=2000)
+
+    def measure(self, name, authentication, header, repeat):
+        request = APIRequestFactory().get('/api/recipes/',
+                                          HTTP_AUTHORIZATION=header)
+        authentication.authenticate(request)
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            for _ in range(repeat):
+                user, _ = authentication.authenticate(request)
+            duration = (time.perf_counter() - start) / repeat
+        self.stdout.write(
+            f'{name}: {duration * 1_000_000:.1f} мкс, '
+            f'SQL-запросов на запрос {len(queries) / repeat:g}'
+        )
+        return user
+
+    def handle(self, *args, **options):
+        user = User.objects.filter(is_active=True).order_by('id').first()
+        if user is None:
+            raise CommandError('Нет активных пользователей!')
+        token, _ = Token.objects.get_or_create(user=user)
+        access = TokenObtainPairSerializer.get_token(user).access_token
+        repeat = options['repeat']
+        token_user = self.measure('Token', TokenAuthentication(),
+                                  f'Token {token.key}', repeat)
+        jwt_user = self.measure('JWT', StatelessJWTAuthentication(),
+                                f'Bearer {access}', repeat)
+        if token_user != jwt_user or token_user.email != jwt_user.email:
+            raise CommandError('Пользователи не совпадают!')
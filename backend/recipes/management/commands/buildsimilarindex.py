@@ -0,0 +1,49 @@
+import itertools
+import os
+from multiprocessing import Pool
+
+from django.core.management import BaseCommand
+from django.db import connections, transaction
+
+from recipes.models import IngredientAmount, SimilarityBucket
+from recipes.similarity import recipe_bands
+
+
+class Command(BaseCommand):
+    """Полная перестройка LSH-индекса похожих рецептов.
+
+    Сигнатуры MinHash считаются параллельно на всех ядрах,
+    корзины записываются в базу пачками.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=os.cpu_count())
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def recipes(self):
+        rows = IngredientAmount.objects.order_by('recipe_id').values_list(
+            'recipe_id', 'ingredient_id'
+        ).iterator(chunk_size=10000)
+        for recipe_id, group in itertools.groupby(rows, lambda row: row[0]):
+            yield recipe_id, {ingredient_id for _, ingredient_id in group}
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        recipes = list(self.recipes())
+        connections.close_all()
+        with Pool(options['processes']) as pool, transaction.atomic():
+            SimilarityBucket.objects.all().delete()
+            buckets = (
+                SimilarityBucket(recipe_id=recipe_id, band=band,
+                                 bucket=bucket)
+                for recipe_id, recipe_buckets in pool.imap_unordered(
+                    recipe_bands, recipes, chunksize=500
+                )
+                for band, bucket in recipe_buckets
+            )
+            while True:
+                batch = list(itertools.islice(buckets, batch_size))
+                if not batch:
+                    break
+                SimilarityBucket.objects.bulk_create(batch)
+        self.stdout.write(f'Проиндексировано рецептов: {len(recipes)}')
@@ -0,0 +1,58 @@
+import os
+import time
+
+from django.conf import settings
+from django.core.management import BaseCommand
+
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    """Удаление файлов изображений рецептов (каталог upload_to поля
+    Recipe.image в MEDIA_ROOT), на которые не ссылается ни один
+    рецепт."""
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Только вывести список файлов.')
+        parser.add_argument('--min-age', type=int,
+                            default=settings.ORPHAN_MEDIA_MIN_AGE,
+                            help='Не трогать файлы моложе N секунд '
+                                 '(загрузки незавершённых транзакций).')
+
+    def iter_files(self, root):
+        stack = [root]
+        while stack:
+            with os.scandir(stack.pop()) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif entry.is_file(follow_symlinks=False):
+                        yield entry
+
+    def handle(self, *args, **options):
+        root = str(settings.MEDIA_ROOT)
+        images = os.path.join(root, Recipe._meta.get_field('image').upload_to)
+        if not os.path.isdir(images):
+            return
+        referenced = set(
+            Recipe.objects.exclude(image='')
+            .values_list('image', flat=True).iterator()
+        )
+        deadline = time.time() - options['min_age']
+        removed = freed = 0
+        for entry in self.iter_files(images):
+            name = os.path.relpath(entry.path, root).replace(os.sep, '/')
+            stat = entry.stat(follow_symlinks=False)
+            if name in referenced or stat.st_mtime > deadline:
+                continue
+            removed += 1
+            freed += stat.st_size
+            if options['dry_run']:
+                self.stdout.write(name)
+            else:
+                os.remove(entry.path)
+        self.stdout.write(
+            f'Файлов без рецептов: {removed}, {freed / 2 ** 20:.1f} МБ'
+            + (' (не удалены)' if options['dry_run'] else ' удалено.')
+        )
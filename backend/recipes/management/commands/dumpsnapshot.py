@@ -0,0 +1,84 @@
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management import BaseCommand, CommandError
+from django.db import connection, connections
+from django.utils import timezone
+
+from recipes.snapshot import (
+    MANIFEST,
+    SNAPSHOT_MODELS,
+    dump_table,
+    export_snapshot,
+    import_snapshot,
+    use_copy
+)
+
+
+class Command(BaseCommand):
+    """Потоковая выгрузка данных Foodgram в каталог: по файлу на таблицу
+    (COPY на PostgreSQL, NDJSON на остальных базах) и manifest.json.
+    Все таблицы читаются из одного согласованного снимка базы:
+    на PostgreSQL - параллельно через экспортированный снимок,
+    на остальных базах - по очереди в одной транзакции."""
+
+    def add_arguments(self, parser):
+        parser.add_argument('directory')
+        parser.add_argument('--jobs', type=int, default=4,
+                            help='Сколько таблиц выгружать одновременно '
+                                 '(только PostgreSQL).')
+        parser.add_argument('--compress', type=int, default=1,
+                            choices=range(10),
+                            help='Уровень gzip, 0 - без сжатия.')
+        parser.add_argument('--anonymize', action='store_true',
+                            help='Заменить email пользователей на '
+                                 'user<id>@example.com.')
+
+    def dump(self, model, options):
+        started = time.monotonic()
+        entry = dump_table(model, options['directory'],
+                           options['compress'], options['anonymize'])
+        self.stdout.write(f'{model._meta.db_table}: {entry["rows"]} '
+                          f'строк ({time.monotonic() - started:.1f} с)')
+        return model._meta.db_table, entry
+
+    def dump_in_snapshot(self, model, options, snapshot_id):
+        try:
+            with import_snapshot(snapshot_id):
+                return self.dump(model, options)
+        finally:
+            connection.close()
+
+    def handle(self, *args, **options):
+        directory = options['directory']
+        os.makedirs(directory, exist_ok=True)
+        if os.path.exists(os.path.join(directory, MANIFEST)):
+            raise CommandError(f'В {directory} уже есть снимок!')
+        started = time.monotonic()
+        connections.close_all()
+        with export_snapshot() as snapshot_id:
+            if snapshot_id is None:
+                tables = dict(self.dump(model, options)
+                              for model in SNAPSHOT_MODELS)
+            else:
+                with ThreadPoolExecutor(max_workers=options['jobs']) as pool:
+                    tables = dict(pool.map(
+                        lambda model: self.dump_in_snapshot(
+                            model, options, snapshot_id
+                        ),
+                        SNAPSHOT_MODELS
+                    ))
+        manifest = {
+            'created': timezone.now().isoformat(),
+            'format': 'copy' if use_copy() else 'ndjson',
+            'compress': options['compress'],
+            'anonymized': options['anonymize'],
+            'tables': tables,
+        }
+        with open(os.path.join(directory, MANIFEST), 'w',
+                  encoding='utf-8') as file:
+            json.dump(manifest, file, ensure_ascii=False, indent=2)
+        self.stdout.write(f'Снимок сохранён в {directory} '
+                          f'({time.monotonic() - started:.1f} с)')
@@ -0,0 +1,244 @@
+import io
+import itertools
+import random
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.management import BaseCommand, CommandError
+from django.db import transaction
+from PIL import Image
+
+from recipes.feed import POPULAR_AUTHORS_CACHE_KEY
+from recipes.models import (
+    Change,
+    Favorite,
+    Ingredient,
+    IngredientAmount,
+    Recipe,
+    ShoppingCart,
+    Tag,
+    Timeline
+)
+from users.models import Subscribe, User
+
+WORDS = ('Суп', 'Салат', 'Пирог', 'Рагу', 'Каша', 'Запеканка', 'Омлет',
+         'Паста', 'Плов', 'Блины', 'Котлеты', 'Соус', 'Десерт', 'Жаркое')
+ADJECTIVES = ('домашний', 'быстрый', 'летний', 'острый', 'сытный',
+              'постный', 'праздничный', 'бабушкин', 'лёгкий', 'пряный')
+
+
+def zipf_weights(count, exponent):
+    """Накопленные веса распределения Ципфа для count элементов."""
+    return list(itertools.accumulate(
+        1 / rank ** exponent for rank in range(1, count + 1)
+    ))
+
+
+class Command(BaseCommand):
+    """Генерация синтетических данных для нагрузочного тестирования:
+    пользователи, рецепты, избранное, списки покупок и подписки
+    с популярностью по закону Ципфа."""
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--recipes', type=int, default=10000)
+        parser.add_argument('--favorites', type=int, default=20,
+                            help='Среднее число избранных на пользователя.')
+        parser.add_argument('--cart', type=int, default=3,
+                            help='Среднее число рецептов в списке покупок.')
+        parser.add_argument('--subscriptions', type=int, default=10,
+                            help='Среднее число подписок на пользователя.')
+        parser.add_argument('--images', type=int, default=50,
+                            help='Сколько разных изображений сгенерировать.')
+        parser.add_argument('--zipf', type=float, default=1.1,
+                            help='Показатель распределения популярности.')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def bulk(self, model, objects, ignore_conflicts=False):
+        count = 0
+        objects = iter(objects)
+        while True:
+            batch = list(itertools.islice(objects, self.batch_size))
+            if not batch:
+                return count
+            with transaction.atomic():
+                model.objects.bulk_create(
+                    batch, ignore_conflicts=ignore_conflicts
+                )
+            count += len(batch)
+
+    def log(self, message, started):
+        self.stdout.write(f'{message} ({time.monotonic() - started:.1f} с)')
+
+    def create_users(self, count, seed):
+        password = make_password(f'synthetic-{seed}')
+        prefix = self.prefix = f'synthetic{seed}_'
+        if User.objects.filter(username__startswith=prefix).exists():
+            raise CommandError(f'Данные с зерном {seed} уже созданы!')
+        self.bulk(User, (
+            User(email=f'{prefix}{index}@example.com',
+                 username=f'{prefix}{index}',
+                 first_name=self.random.choice(('Анна', 'Иван', 'Мария',
+                                                'Пётр', 'Ольга', 'Юлия')),
+                 last_name=f'Тестов{index}',
+                 password=password)
+            for index in range(count)
+        ))
+        return list(User.objects.filter(
+            username__startswith=prefix
+        ).order_by('id').values_list('id', flat=True))
+
+    def create_images(self, count):
+        storage = Recipe._meta.get_field('image').storage
+        names = []
+        for _ in range(count):
+            buffer = io.BytesIO()
+            color = tuple(self.random.randrange(256) for _ in range(3))
+            Image.new('RGB', (64, 64), color).save(buffer, 'JPEG')
+            names.append(storage.save('recipes/synthetic.jpg',
+                                      ContentFile(buffer.getvalue())))
+        return names
+
+    def pick(self, population, cum_weights, count):
+        """count разных элементов с популярностью по Ципфу."""
+        count = min(count, len(population))
+        chosen = set()
+        while len(chosen) < count:
+            chosen.update(self.random.choices(
+                population, cum_weights=cum_weights, k=count - len(chosen)
+            ))
+        return chosen
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        exponent = options['zipf']
+        started = time.monotonic()
+
+        tag_ids = list(Tag.objects.values_list('id', flat=True))
+        ingredient_ids = list(Ingredient.objects.values_list('id', flat=True))
+        if not tag_ids or not ingredient_ids:
+            raise CommandError('Сначала загрузите теги и ингредиенты '
+                               '(loadingredientstags)!')
+        self.random.shuffle(ingredient_ids)
+        ingredient_weights = zipf_weights(len(ingredient_ids), exponent)
+
+        user_ids = self.create_users(options['users'], options['seed'])
+        author_weights = zipf_weights(len(user_ids), exponent)
+        self.log(f'Пользователей: {len(user_ids)}', started)
+
+        images = self.create_images(options['images'])
+        last_recipe_id = Recipe.objects.order_by('-id').values_list(
+            'id', flat=True
+        ).first() or 0
+        authors = self.random.choices(user_ids, cum_weights=author_weights,
+                                      k=options['recipes'])
+        self.bulk(Recipe, (
+            Recipe(author_id=author_id,
+                   name=(f'{self.random.choice(WORDS)} '
+                         f'{self.random.choice(ADJECTIVES)} №{index}'),
+                   text='Синтетический рецепт для нагрузочного теста.',
+                   cooking_time=self.random.randint(5, 180),
+                   image=self.random.choice(images))
+            for index, author_id in enumerate(authors)
+        ))
+        recipes = list(Recipe.objects.filter(
+            id__gt=last_recipe_id, author__username__startswith=self.prefix
+        ).order_by('id').values_list('id', 'author_id'))
+        recipe_ids = [recipe_id for recipe_id, _ in recipes]
+        recipe_weights = zipf_weights(len(recipe_ids), exponent)
+        self.log(f'Рецептов: {len(recipes)}', started)
+
+        amounts = self.bulk(IngredientAmount, (
+            IngredientAmount(recipe_id=recipe_id, ingredient_id=ingredient_id,
+                             amount=self.random.randint(1, 500))
+            for recipe_id in recipe_ids
+            for ingredient_id in self.pick(
+                ingredient_ids, ingredient_weights,
+                max(1, round(self.random.gauss(8, 3)))
+            )
+        ))
+        links = self.bulk(Recipe.tags.through, (
+            Recipe.tags.through(recipe_id=recipe_id, tag_id=tag_id)
+            for recipe_id in recipe_ids
+            for tag_id in self.random.sample(
+                tag_ids, self.random.randint(1, min(3, len(tag_ids)))
+            )
+        ))
+        self.log(f'Ингредиентов в рецептах: {amounts}, тегов: {links}',
+                 started)
+
+        for model, average in ((Favorite, options['favorites']),
+                               (ShoppingCart, options['cart'])):
+            count = self.bulk(model, (
+                model(user_id=user_id, recipe_id=recipe_id)
+                for user_id in user_ids
+                for recipe_id in self.pick(
+                    recipe_ids, recipe_weights,
+                    int(self.random.expovariate(1 / average))
+                    if average else 0
+                )
+            ), ignore_conflicts=True)
+            self.log(f'{model._meta.verbose_name_plural}: {count}', started)
+
+        subscriptions = [
+            (user_id, author_id)
+            for user_id in user_ids
+            for author_id in self.pick(
+                user_ids, author_weights,
+                int(self.random.expovariate(1 / options['subscriptions']))
+                if options['subscriptions'] else 0
+            )
+            if author_id != user_id
+        ]
+        self.bulk(Subscribe, (
+            Subscribe(user_id=user_id, author_id=author_id)
+            for user_id, author_id in subscriptions
+        ), ignore_conflicts=True)
+        self.log(f'Подписок: {len(subscriptions)}', started)
+
+        self.fill_timelines(recipes, subscriptions)
+        self.record_changes(recipe_ids)
+        self.log('Готово', started)
+
+    def fill_timelines(self, recipes, subscriptions):
+        """Раскладывает рецепты по лентам подписчиков (bulk_create
+        не вызывает сигналы)."""
+        cache.delete(POPULAR_AUTHORS_CACHE_KEY)
+        followers = defaultdict(int)
+        for _, author_id in subscriptions:
+            followers[author_id] += 1
+        latest = defaultdict(list)
+        for recipe_id, author_id in reversed(recipes):
+            if len(latest[author_id]) < settings.FEED_BACKFILL_LIMIT:
+                latest[author_id].append(recipe_id)
+        self.bulk(Timeline, (
+            Timeline(user_id=user_id, author_id=author_id,
+                     recipe_id=recipe_id)
+            for user_id, author_id in subscriptions
+            if followers[author_id] <= settings.FEED_FANOUT_LIMIT
+            for recipe_id in latest[author_id]
+        ), ignore_conflicts=True)
+
+    def record_changes(self, recipe_ids):
+        """Отмечает созданные объекты в журнале синхронизации."""
+        self.bulk(Change, (
+            Change(model='recipe', object_id=recipe_id)
+            for recipe_id in recipe_ids
+        ), ignore_conflicts=True)
+        for name, model, field in (
+            ('favorite', Favorite, 'recipe_id'),
+            ('cart', ShoppingCart, 'recipe_id'),
+            ('subscription', Subscribe, 'author_id'),
+        ):
+            self.bulk(Change, (
+                Change(model=name, object_id=object_id, user_id=user_id)
+                for object_id, user_id in model.objects.filter(
+                    user__username__startswith=self.prefix
+                ).values_list(field, 'user_id').iterator()
+            ), ignore_conflicts=True)
@@ -0,0 +1,46 @@
+import sys
+import time
+
+from django.core.management import BaseCommand, CommandError
+
+from recipes.importer import (FormatError, RecipeImporter, read_csv,
+                              read_ndjson)
+from users.models import User
+
+
+class Command(BaseCommand):
+    """Импорт рецептов из NDJSON или CSV. Ингредиенты указываются
+    названием и единицей измерения, как в data/ingredients.json."""
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл или "-" для stdin.')
+        parser.add_argument('--format', choices=('ndjson', 'csv'),
+                            help='По умолчанию - по расширению файла.')
+        parser.add_argument('--author',
+                            help='Email автора для записей без author.')
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format'] or (
+            'csv' if path.endswith('.csv') else 'ndjson'
+        )
+        author = None
+        if options['author']:
+            author = User.objects.filter(email=options['author']).first()
+            if author is None:
+                raise CommandError(f'Автор {options["author"]} не найден!')
+        reader = read_csv if file_format == 'csv' else read_ndjson
+        importer = RecipeImporter(author, options['batch_size'])
+        started = time.monotonic()
+        with (open(path, 'rb') if path != '-'
+              else sys.stdin.buffer) as stream:
+            try:
+                created, errors = importer.run(reader(stream))
+            except FormatError as error:
+                raise CommandError(str(error))
+        for line_number, error in errors:
+            self.stderr.write(f'Строка {line_number}: {error}')
+        elapsed = time.monotonic() - started
+        self.stdout.write(f'Импортировано рецептов: {created}, '
+                          f'ошибок: {len(errors)} ({elapsed:.1f} с)')
@@ -0,0 +1,85 @@
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.cache import cache
+from django.core.management import BaseCommand, CommandError
+from django.db import connection, connections, transaction
+
+from recipes.cache import bump_generation
+from recipes.signals import GENERATION_SENDERS
+from recipes.snapshot import (
+    MANIFEST,
+    SNAPSHOT_MODELS,
+    clear_tables,
+    dependency_levels,
+    reset_sequences,
+    restore_table,
+    use_copy
+)
+
+
+class Command(BaseCommand):
+    """Загрузка снимка dumpsnapshot. Таблицы загружаются по уровням
+    зависимостей внешних ключей, таблицы одного уровня - параллельно
+    (на SQLite - по одной: у неё один писатель)."""
+
+    def add_arguments(self, parser):
+        parser.add_argument('directory')
+        parser.add_argument('--jobs', type=int, default=4)
+        parser.add_argument('--replace', action='store_true',
+                            help='Удалить текущие данные таблиц снимка.')
+
+    def restore(self, model, entry):
+        try:
+            started = time.monotonic()
+            rows = restore_table(model, self.directory, entry,
+                                 self.manifest['compress'])
+            self.stdout.write(f'{model._meta.db_table}: {rows} строк '
+                              f'({time.monotonic() - started:.1f} с)')
+        finally:
+            if connection.vendor != 'sqlite':
+                connection.close()
+
+    def handle(self, *args, **options):
+        self.directory = options['directory']
+        try:
+            with open(os.path.join(self.directory, MANIFEST),
+                      encoding='utf-8') as file:
+                self.manifest = json.load(file)
+        except FileNotFoundError:
+            raise CommandError(f'В {self.directory} нет {MANIFEST}!')
+        if self.manifest['format'] != ('copy' if use_copy() else 'ndjson'):
+            raise CommandError(f'Снимок в формате {self.manifest["format"]} '
+                               f'нельзя загрузить в {connection.vendor}!')
+        tables = self.manifest['tables']
+        models = [model for model in SNAPSHOT_MODELS
+                  if model._meta.db_table in tables]
+        if options['replace']:
+            with transaction.atomic():
+                clear_tables(models)
+        elif any(model._base_manager.exists() for model in models):
+            raise CommandError('Таблицы не пусты, используйте --replace!')
+
+        started = time.monotonic()
+        jobs = 1 if connection.vendor == 'sqlite' else options['jobs']
+        connections.close_all()
+        for level in dependency_levels(models):
+            if jobs == 1:
+                for model in level:
+                    self.restore(model, tables[model._meta.db_table])
+                continue
+            with ThreadPoolExecutor(max_workers=jobs) as pool:
+                list(pool.map(
+                    lambda model: self.restore(
+                        model, tables[model._meta.db_table]
+                    ),
+                    level
+                ))
+        reset_sequences(models)
+        for family in set(GENERATION_SENDERS.values()):
+            bump_generation(family)
+        cache.clear()
+        self.stdout.write(f'Снимок загружен '
+                          f'({time.monotonic() - started:.1f} с)')
@@ -0,0 +1,58 @@
+# Generated by Django 3.2.3 on 2026-10-19 12:28
+
+from django.db import migrations, models
+
+
+def record_existing_objects(apps, schema_editor):
+    Change = apps.get_model('recipes', 'Change')
+    sources = (
+        ('tag', apps.get_model('recipes', 'Tag'), 'id', None),
+        ('ingredient', apps.get_model('recipes', 'Ingredient'), 'id', None),
+        ('recipe', apps.get_model('recipes', 'Recipe'), 'id', None),
+        ('favorite', apps.get_model('recipes', 'Favorite'),
+         'recipe_id', 'user_id'),
+        ('cart', apps.get_model('recipes', 'ShoppingCart'),
+         'recipe_id', 'user_id'),
+        ('subscription', apps.get_model('users', 'Subscribe'),
+         'author_id', 'user_id'),
+    )
+    for name, model, object_field, user_field in sources:
+        fields = (object_field, user_field) if user_field else (object_field,)
+        Change.objects.bulk_create(
+            (Change(model=name, object_id=row[0],
+                    user_id=row[1] if user_field else 0)
+             for row in model.objects.values_list(*fields).iterator()),
+            batch_size=1000,
+            ignore_conflicts=True
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0004_timeline'),
+        ('users', '0003_auto_20231130_1822'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Change',
+            fields=[
+                ('seq', models.BigAutoField(primary_key=True, serialize=False)),
+                ('model', models.CharField(max_length=32, verbose_name='Модель')),
+                ('object_id', models.BigIntegerField(verbose_name='id объекта')),
+                ('user_id', models.BigIntegerField(default=0, verbose_name='id владельца')),
+                ('deleted', models.BooleanField(default=False, verbose_name='Удалён')),
+            ],
+            options={
+                'verbose_name': 'Изменение',
+                'verbose_name_plural': 'Журнал изменений',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='change',
+            constraint=models.UniqueConstraint(fields=('model', 'user_id', 'object_id'), name='unique_change_object'),
+        ),
+        migrations.RunPython(record_existing_objects,
+                             migrations.RunPython.noop),
+    ]
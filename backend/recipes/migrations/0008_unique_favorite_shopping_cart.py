@@ -0,0 +1,37 @@
+# Generated by Django 3.2.3 on 2026-10-19 12:41
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def remove_duplicates(apps, schema_editor):
+    for name in ('Favorite', 'ShoppingCart'):
+        model = apps.get_model('recipes', name)
+        duplicates = (
+            model.objects.values('recipe', 'user')
+            .annotate(first=Min('id'), count=Count('id'))
+            .filter(count__gt=1)
+        )
+        for row in duplicates.iterator():
+            model.objects.filter(
+                recipe=row['recipe'], user=row['user']
+            ).exclude(id=row['first']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0007_similaritybucket'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='favorite',
+            constraint=models.UniqueConstraint(fields=('recipe', 'user'), name='unique_favorite_recipe_user'),
+        ),
+        migrations.AddConstraint(
+            model_name='shoppingcart',
+            constraint=models.UniqueConstraint(fields=('recipe', 'user'), name='unique_shoppingcart_recipe_user'),
+        ),
+    ]
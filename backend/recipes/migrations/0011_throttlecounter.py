@@ -0,0 +1,30 @@
+# Generated by Django 3.2.3 on 2026-10-19 13:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0010_idempotencykey'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ThrottleCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=255, verbose_name='Пользователь или IP')),
+                ('window', models.BigIntegerField(db_index=True, verbose_name='Номер окна')),
+                ('count', models.PositiveIntegerField(verbose_name='Расход')),
+            ],
+            options={
+                'verbose_name': 'Счётчик ограничения запросов',
+                'verbose_name_plural': 'Счётчики ограничения запросов',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='throttlecounter',
+            constraint=models.UniqueConstraint(fields=('key', 'window'), name='unique_throttle_counter'),
+        ),
+    ]
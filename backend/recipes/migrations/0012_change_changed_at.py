@@ -0,0 +1,19 @@
+# Generated by Django 3.2.3 on 2026-10-19 13:23
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0011_throttlecounter'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='change',
+            name='changed_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, verbose_name='Время изменения'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 3.2.3 on 2026-10-19 13:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0012_change_changed_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FlightLock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=64, unique=True, verbose_name='Ключ запроса')),
+                ('expires_at', models.DateTimeField(verbose_name='Истекает')),
+            ],
+            options={
+                'verbose_name': 'Блокировка single-flight',
+                'verbose_name_plural': 'Блокировки single-flight',
+            },
+        ),
+    ]
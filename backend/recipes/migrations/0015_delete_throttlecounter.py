@@ -0,0 +1,16 @@
+# Generated by Django 3.2.3 on 2026-10-19 13:45
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0014_tag_ordering'),
+    ]
+
+    operations = [
+        migrations.DeleteModel(
+            name='ThrottleCounter',
+        ),
+    ]
@@ -1,6 +1,8 @@
 from colorfield.fields import ColorField
+from django.core.serializers.json import DjangoJSONEncoder
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.db import models
+from django.utils import timezone
 
 from api.validators import (
     validate_name_recipe,
@@ -8,12 +10,14 @@ from api.validators import (
 )
 from foodgram.constants import (
     COLOR_MAX_LENGTH,
+    IDEMPOTENCY_KEY_MAX_LENGTH,
     INGREDIENT_NAME,
     INGREDIENT_MEASUREMENT_UNIT,
     RECIPE_NAME,
     SLUG_MAX_LENGTH,
     TAG_NAME
 )
+from recipes.storage import ContentAddressedStorage
 from users.models import User
 
 
@@ -31,6 +35,7 @@ class Tag(models.Model):
                             unique=True)
 
     class Meta:
+        ordering = ('id',)
         verbose_name = 'Тэг'
         verbose_name_plural = 'Тэги'
 
@@ -75,7 +80,8 @@ class Recipe(models.Model):
     tags = models.ManyToManyField(Tag, verbose_name='Теги')
     image = models.ImageField(
         verbose_name='Изображение',
-        upload_to='recipes/'
+        upload_to='recipes/',
+        storage=ContentAddressedStorage()
     )
     name = models.CharField(
         verbose_name='Название рецепта',
@@ -165,14 +171,14 @@ class ModelFavoriteOrShoppingCart(models.Model):
         abstract = True
         constraints = [models.UniqueConstraint(
             fields=['recipe', 'user'],
-            name='unique_favorite_shopping_cart'
+            name='unique_%(class)s_recipe_user'
         )]
 
 
 class ShoppingCart(ModelFavoriteOrShoppingCart):
     """Модель для списка покупок."""
 
-    class Meta:
+    class Meta(ModelFavoriteOrShoppingCart.Meta):
         verbose_name = 'Список покупок'
         verbose_name_plural = 'Списки покупок'
         default_related_name = 'shopping_cart'
@@ -184,7 +190,148 @@ class ShoppingCart(ModelFavoriteOrShoppingCart):
 class Favorite(ModelFavoriteOrShoppingCart):
     """Модель для избранного."""
 
-    class Meta:
+    class Meta(ModelFavoriteOrShoppingCart.Meta):
         verbose_name = 'Избранный рецепт'
         verbose_name_plural = 'Избранные рецепты'
         default_related_name = 'in_favorite'
+
+
+class Timeline(models.Model):
+    """Лента рецептов авторов, на которых подписан пользователь.
+
+    Заполняется при публикации рецепта (fan-out на подписчиков),
+    для авторов с очень большим числом подписчиков рецепты
+    подтягиваются при чтении ленты.
+    """
+
+    user = models.ForeignKey(User,
+                             verbose_name='Читатель',
+                             related_name='timeline',
+                             on_delete=models.CASCADE)
+    author = models.ForeignKey(User,
+                               verbose_name='Автор рецепта',
+                               related_name='+',
+                               on_delete=models.CASCADE)
+    recipe = models.ForeignKey(Recipe,
+                               verbose_name='Рецепт',
+                               related_name='+',
+                               on_delete=models.CASCADE)
+
+    class Meta:
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Ленты подписок'
+        constraints = [models.UniqueConstraint(
+            fields=['user', 'recipe'],
+            name='unique_timeline_recipe'
+        )]
+        indexes = [models.Index(fields=['user', '-recipe'],
+                                name='timeline_user_recipe_idx')]
+
+    def __str__(self):
+        return f'{self.recipe} в ленте {self.user}'
+
+
+class Change(models.Model):
+    """Последнее изменение объекта для синхронизации клиентов.
+
+    На каждый объект хранится одна запись: при изменении она
+    получает новый монотонный номер seq и время changed_at. Удаление
+    оставляет запись с deleted=True (tombstone). Для избранного,
+    списка покупок и подписок object_id - id рецепта или автора,
+    а user_id - владелец записи.
+    """
+
+    seq = models.BigAutoField(primary_key=True)
+    model = models.CharField(verbose_name='Модель', max_length=32)
+    object_id = models.BigIntegerField(verbose_name='id объекта')
+    user_id = models.BigIntegerField(verbose_name='id владельца', default=0)
+    deleted = models.BooleanField(verbose_name='Удалён', default=False)
+    changed_at = models.DateTimeField(verbose_name='Время изменения',
+                                      default=timezone.now)
+
+    class Meta:
+        verbose_name = 'Изменение'
+        verbose_name_plural = 'Журнал изменений'
+        constraints = [models.UniqueConstraint(
+            fields=['model', 'user_id', 'object_id'],
+            name='unique_change_object'
+        )]
+
+    def __str__(self):
+        return f'{self.seq}: {self.model} {self.object_id}'
+
+
+class SimilarityBucket(models.Model):
+    """Корзина LSH-индекса похожих рецептов (по одной на полосу MinHash)."""
+
+    recipe = models.ForeignKey(Recipe,
+                               verbose_name='Рецепт',
+                               related_name='+',
+                               on_delete=models.CASCADE)
+    band = models.PositiveSmallIntegerField(verbose_name='Полоса')
+    bucket = models.BigIntegerField(verbose_name='Хэш полосы')
+
+    class Meta:
+        verbose_name = 'Корзина LSH'
+        verbose_name_plural = 'Индекс похожих рецептов'
+        constraints = [models.UniqueConstraint(
+            fields=['recipe', 'band'],
+            name='unique_recipe_band'
+        )]
+        indexes = [models.Index(fields=['band', 'bucket'],
+                                name='similarity_bucket_idx')]
+
+    def __str__(self):
+        return f'{self.recipe_id}: {self.band}/{self.bucket}'
+
+
+class CacheGeneration(models.Model):
+    """Счётчик поколения семейства моделей для согласования кэшей
+    процессов: каждая запись в модели семейства увеличивает value."""
+
+    family = models.CharField(verbose_name='Семейство моделей',
+                              max_length=32,
+                              primary_key=True)
+    value = models.BigIntegerField(verbose_name='Поколение', default=0)
+
+    class Meta:
+        verbose_name = 'Поколение кэша'
+        verbose_name_plural = 'Поколения кэша'
+
+    def __str__(self):
+        return f'{self.family}: {self.value}'
+
+
+class IdempotencyKey(models.Model):
+    """Ответ на запрос с заголовком Idempotency-Key для повторов.
+
+    Пока первый запрос выполняется, status пуст.
+    """
+
+    user = models.ForeignKey(User,
+                             on_delete=models.CASCADE,
+                             related_name='+',
+                             verbose_name='Пользователь')
+    key = models.CharField(verbose_name='Ключ',
+                           max_length=IDEMPOTENCY_KEY_MAX_LENGTH)
+    fingerprint = models.CharField(verbose_name='Отпечаток запроса',
+                                   max_length=64)
+    status = models.PositiveSmallIntegerField(verbose_name='Код ответа',
+                                              blank=True,
+                                              null=True)
+    response = models.JSONField(verbose_name='Ответ',
+                                encoder=DjangoJSONEncoder,
+                                blank=True,
+                                null=True)
+    created_at = models.DateTimeField(verbose_name='Создан')
+
+    class Meta:
+        verbose_name = 'Ключ идемпотентности'
+        verbose_name_plural = 'Ключи идемпотентности'
+        constraints = [models.UniqueConstraint(
+            fields=['user', 'key'],
+            name='unique_idempotency_key'
+        )]
+
+    def __str__(self):
+        return f'{self.user_id}: {self.key}'
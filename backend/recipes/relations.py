@@ -0,0 +1,80 @@
+from django.db import connections, router
+from django.db.models.signals import post_delete, post_save
+
+
+def relation_fields(model):
+    """Поле пользователя и поле объекта связи (рецепт или автор)."""
+    user_field = model._meta.get_field('user')
+    target_field = next(
+        field for field in model._meta.concrete_fields
+        if field.is_relation and field is not user_field
+    )
+    return user_field, target_field
+
+
+def add_relation(model, user_id, target_id):
+    """Создаёт связь пользователя с объектом одним запросом.
+
+    INSERT ... SELECT ... ON CONFLICT DO NOTHING RETURNING не падает
+    при одновременных запросах и ничего не вставляет, если связь уже
+    есть или объекта нет (или это сам пользователь). Возвращает
+    созданную запись либо None. Сигнал post_save отправляется вручную,
+    чтобы сработали обработчики журнала синхронизации и ленты.
+    """
+    user_field, target_field = relation_fields(model)
+    target_meta = target_field.related_model._meta
+    using = router.db_for_write(model)
+    connection = connections[using]
+    quote = connection.ops.quote_name
+    target_pk = quote(target_meta.pk.column)
+    sql = (
+        f'INSERT INTO {quote(model._meta.db_table)} '
+        f'({quote(user_field.column)}, {quote(target_field.column)}) '
+        f'SELECT %s, {target_pk} FROM {quote(target_meta.db_table)} '
+        f'WHERE {target_pk} = %s'
+    )
+    params = [user_id, target_id]
+    if target_field.related_model is user_field.related_model:
+        sql += f' AND {target_pk} <> %s'
+        params.append(user_id)
+    sql += f' ON CONFLICT DO NOTHING RETURNING {quote(model._meta.pk.column)}'
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        row = cursor.fetchone()
+    if row is None:
+        return None
+    instance = model(pk=row[0], **{user_field.attname: user_id,
+                                   target_field.attname: target_id})
+    instance._state.adding = False
+    instance._state.db = using
+    post_save.send(sender=model, instance=instance, created=True,
+                   update_fields=None, raw=False, using=using)
+    return instance
+
+
+def remove_relation(model, user_id, target_id):
+    """Удаляет связь одним DELETE ... RETURNING.
+
+    Возвращает True, если запись была удалена. Сигнал post_delete
+    отправляется вручную, как и в add_relation.
+    """
+    user_field, target_field = relation_fields(model)
+    using = router.db_for_write(model)
+    connection = connections[using]
+    quote = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {quote(model._meta.db_table)} '
+            f'WHERE {quote(user_field.column)} = %s '
+            f'AND {quote(target_field.column)} = %s '
+            f'RETURNING {quote(model._meta.pk.column)}',
+            [user_id, target_id]
+        )
+        row = cursor.fetchone()
+    if row is None:
+        return False
+    instance = model(pk=row[0], **{user_field.attname: user_id,
+                                   target_field.attname: target_id})
+    instance._state.db = using
+    post_delete.send(sender=model, instance=instance, using=using)
+    return True
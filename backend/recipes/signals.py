@@ -0,0 +1,200 @@
+from django.db import transaction
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_init,
+    post_save
+)
+from django.dispatch import receiver
+
+from jobs.queue import enqueue
+from recipes.cache import (
+    bump_generation,
+    invalidate_all_recipe_documents,
+    invalidate_ingredients,
+    invalidate_recipe_documents,
+    invalidate_tags
+)
+from recipes.feed import (
+    authors_unfollowed,
+    backfill_timeline,
+    fan_out_recipe,
+    prune_timeline
+)
+from recipes.models import (
+    Favorite,
+    Ingredient,
+    IngredientAmount,
+    Recipe,
+    ShoppingCart,
+    Tag
+)
+from recipes.similarity import update_similarity_index
+from recipes.sync import record_change, record_changes
+from users.models import ClaimsUser, Subscribe, User
+
+GENERATION_SENDERS = {
+    Tag: 'tag',
+    Ingredient: 'ingredient',
+    Recipe: 'recipe',
+    IngredientAmount: 'recipe',
+    Favorite: 'favorite',
+    ShoppingCart: 'cart',
+    Subscribe: 'subscription',
+}
+DOCUMENT_USER_FIELDS = ('email', 'username', 'first_name', 'last_name')
+
+SYNC_SENDERS = {
+    Recipe: ('recipe', 'id', None),
+    Tag: ('tag', 'id', None),
+    Ingredient: ('ingredient', 'id', None),
+    Favorite: ('favorite', 'recipe_id', 'user_id'),
+    ShoppingCart: ('cart', 'recipe_id', 'user_id'),
+    Subscribe: ('subscription', 'author_id', 'user_id'),
+}
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_published(sender, instance, created, **kwargs):
+    """Ставит в очередь рассылку нового рецепта по лентам подписчиков."""
+    if created:
+        enqueue(fan_out_recipe, key=f'fan_out_recipe:{instance.pk}',
+                recipe_id=instance.pk, author_id=instance.author_id)
+
+
+@receiver(post_save, sender=Subscribe)
+def subscribed(sender, instance, created, **kwargs):
+    """Заполняет ленту рецептами нового автора."""
+    if created:
+        backfill_timeline(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Subscribe)
+def unsubscribed(sender, instance, **kwargs):
+    """Очищает ленту от рецептов автора после отписки."""
+    prune_timeline(instance.user_id, instance.author_id)
+    authors_unfollowed([instance.author_id])
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_save, sender=IngredientAmount)
+@receiver(post_delete, sender=IngredientAmount)
+def recipe_ingredients_changed(sender, instance, **kwargs):
+    """Ставит в очередь пересчёт рецепта в индексе похожих."""
+    recipe_id = instance.pk if sender is Recipe else instance.recipe_id
+    enqueue(update_similarity_index, key=f'similarity:{recipe_id}',
+            recipe_id=recipe_id)
+
+
+def document_user_values(instance):
+    """Загруженные значения полей автора из документов рецептов
+    (отложенные поля не загружаются)."""
+    return tuple(instance.__dict__.get(name) for name in DOCUMENT_USER_FIELDS)
+
+
+@receiver(post_init, sender=User)
+@receiver(post_init, sender=ClaimsUser)
+def author_loaded(sender, instance, **kwargs):
+    instance._document_user_values = document_user_values(instance)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_save, sender=ClaimsUser)
+def author_changed(sender, instance, created, **kwargs):
+    """Данные автора входят в документы всех его рецептов: при их
+    изменении рецепты автора получают новые номера в журнале
+    изменений и новые отметки документов в кэше.
+
+    Сохранения, не затронувшие эти поля (например, last_login),
+    не обращаются к базе.
+    """
+    update_fields = kwargs.get('update_fields')
+    values = document_user_values(instance)
+    changed = values != instance._document_user_values
+    instance._document_user_values = values
+    if (created or not changed
+            or update_fields
+            and update_fields.isdisjoint(DOCUMENT_USER_FIELDS)):
+        return
+    recipe_ids = list(instance.recipes.values_list('id', flat=True))
+    if recipe_ids:
+        recipes_changed(recipe_ids)
+        transaction.on_commit(lambda: bump_generation('recipe'))
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def ingredient_changed(sender, **kwargs):
+    """Название ингредиента может входить в любой документ рецепта."""
+    invalidate_ingredients()
+    transaction.on_commit(invalidate_all_recipe_documents)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def tag_changed(sender, **kwargs):
+    """Сбрасывает кэш слагов тегов и документы рецептов."""
+    invalidate_tags()
+    transaction.on_commit(invalidate_all_recipe_documents)
+
+
+def recipes_changed(recipe_ids, deleted=False):
+    """Отмечает изменение рецептов в журнале синхронизации, после
+    коммита их документы в кэше получают новые отметки."""
+    record_changes('recipe', recipe_ids, deleted=deleted)
+    transaction.on_commit(lambda: invalidate_recipe_documents(recipe_ids))
+
+
+def record_sync_change(sender, instance, deleted):
+    model, object_field, user_field = SYNC_SENDERS[sender]
+    if sender is Recipe:
+        recipes_changed([instance.pk], deleted)
+        return
+    record_change(
+        model,
+        getattr(instance, object_field),
+        user_id=getattr(instance, user_field) if user_field else 0,
+        deleted=deleted
+    )
+
+
+def object_saved(sender, instance, **kwargs):
+    """Отмечает изменение объекта в журнале синхронизации."""
+    if sender in SYNC_SENDERS:
+        record_sync_change(sender, instance, deleted=False)
+    elif sender is IngredientAmount:
+        recipes_changed([instance.recipe_id])
+
+
+def object_deleted(sender, instance, **kwargs):
+    """Оставляет tombstone удалённого объекта в журнале синхронизации."""
+    if sender in SYNC_SENDERS:
+        record_sync_change(sender, instance, deleted=True)
+    elif sender is IngredientAmount:
+        recipes_changed([instance.recipe_id])
+
+
+for sync_sender in (*SYNC_SENDERS, IngredientAmount):
+    post_save.connect(object_saved, sender=sync_sender)
+    post_delete.connect(object_deleted, sender=sync_sender)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def recipe_tags_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """Изменение тегов рецепта меняет и сам рецепт."""
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    recipe_ids = [instance.pk] if not reverse else list(pk_set or ())
+    recipes_changed(recipe_ids)
+    transaction.on_commit(lambda: bump_generation('recipe'))
+
+
+def generation_changed(sender, **kwargs):
+    """Увеличивает счётчик поколения после коммита записи."""
+    family = GENERATION_SENDERS[sender]
+    transaction.on_commit(lambda: bump_generation(family))
+
+
+for generation_sender in GENERATION_SENDERS:
+    post_save.connect(generation_changed, sender=generation_sender)
+    post_delete.connect(generation_changed, sender=generation_sender)
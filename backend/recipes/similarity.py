@@ -0,0 +1,102 @@
+import hashlib
+import random
+import struct
+from collections import defaultdict
+from functools import reduce
+from operator import or_
+
+from django.db import transaction
+from django.db.models import Count, Q
+
+from jobs.queue import task
+from recipes.models import IngredientAmount, SimilarityBucket
+
+BANDS = 16
+ROWS = 4
+PRIME = (1 << 61) - 1
+MAX_HASH = (1 << 32) - 1
+CANDIDATES = 50
+
+_random = random.Random(20231130)
+PERMUTATIONS = tuple(
+    (_random.randrange(1, PRIME), _random.randrange(0, PRIME))
+    for _ in range(BANDS * ROWS)
+)
+
+
+def minhash(ingredient_ids):
+    """MinHash-сигнатура множества ингредиентов."""
+    return [
+        min((a * ingredient_id + b) % PRIME & MAX_HASH
+            for ingredient_id in ingredient_ids)
+        for a, b in PERMUTATIONS
+    ]
+
+
+def bands(ingredient_ids):
+    """Хэши полос сигнатуры: (номер полосы, хэш) для LSH-индекса."""
+    if not ingredient_ids:
+        return []
+    signature = minhash(ingredient_ids)
+    result = []
+    for band in range(BANDS):
+        rows = signature[band * ROWS:(band + 1) * ROWS]
+        digest = hashlib.blake2b(struct.pack(f'{ROWS}I', *rows),
+                                 digest_size=8).digest()
+        result.append((band, int.from_bytes(digest, 'big', signed=True)))
+    return result
+
+
+def recipe_bands(item):
+    """Полосы для пары (id рецепта, ингредиенты) - для пула процессов."""
+    recipe_id, ingredient_ids = item
+    return recipe_id, bands(ingredient_ids)
+
+
+def ingredient_sets(recipe_ids):
+    sets = defaultdict(set)
+    for recipe_id, ingredient_id in IngredientAmount.objects.filter(
+        recipe_id__in=recipe_ids
+    ).values_list('recipe_id', 'ingredient_id'):
+        sets[recipe_id].add(ingredient_id)
+    return sets
+
+
+@task(queue='index')
+def update_similarity_index(recipe_id):
+    """Пересчитывает корзины LSH-индекса для рецепта."""
+    recipe_buckets = bands(ingredient_sets([recipe_id])[recipe_id])
+    with transaction.atomic():
+        SimilarityBucket.objects.filter(recipe_id=recipe_id).delete()
+        SimilarityBucket.objects.bulk_create(
+            SimilarityBucket(recipe_id=recipe_id, band=band, bucket=bucket)
+            for band, bucket in recipe_buckets
+        )
+
+
+def similar_recipes(recipe_id, limit):
+    """id похожих рецептов и коэффициент Жаккара по ингредиентам.
+
+    Кандидаты - рецепты, совпавшие хотя бы в одной полосе LSH,
+    до CANDIDATES самых частых пересчитываются точно.
+    """
+    ingredients = ingredient_sets([recipe_id])[recipe_id]
+    recipe_buckets = bands(ingredients)
+    if not recipe_buckets:
+        return []
+    same_bucket = reduce(or_, (Q(band=band, bucket=bucket)
+                               for band, bucket in recipe_buckets))
+    candidates = list(
+        SimilarityBucket.objects.filter(same_bucket)
+        .exclude(recipe_id=recipe_id)
+        .values('recipe_id')
+        .annotate(hits=Count('id'))
+        .order_by('-hits', 'recipe_id')
+        .values_list('recipe_id', flat=True)[:CANDIDATES]
+    )
+    scored = []
+    for candidate, other in ingredient_sets(candidates).items():
+        jaccard = len(ingredients & other) / len(ingredients | other)
+        scored.append((jaccard, candidate))
+    scored.sort(key=lambda item: (-item[0], item[1]))
+    return [(candidate, jaccard) for jaccard, candidate in scored[:limit]]
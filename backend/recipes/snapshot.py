@@ -0,0 +1,234 @@
+import gzip
+import json
+import os
+from contextlib import contextmanager
+
+from django.core.management.color import no_style
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, transaction
+from django.db.models.deletion import get_candidate_relations_to_delete
+
+from recipes.deletion import chunks
+from recipes.models import (
+    Change,
+    Favorite,
+    Ingredient,
+    IngredientAmount,
+    Recipe,
+    ShoppingCart,
+    SimilarityBucket,
+    Tag,
+    Timeline
+)
+from users.models import Subscribe, User
+
+SNAPSHOT_MODELS = (
+    User, Tag, Ingredient, Recipe, Recipe.tags.through,
+    Recipe.ingredients.through, IngredientAmount, Favorite, ShoppingCart,
+    Subscribe, Timeline, SimilarityBucket, Change,
+)
+MANIFEST = 'manifest.json'
+ANONYMOUS_EMAIL = ('user', '@example.com')
+NDJSON_BATCH_SIZE = 5000
+
+
+def table_fields(model):
+    return model._meta.concrete_fields
+
+
+def use_copy():
+    """COPY доступен только на PostgreSQL."""
+    return connection.vendor == 'postgresql'
+
+
+def file_name(model, compress):
+    extension = 'copy' if use_copy() else 'ndjson'
+    return (f'{model._meta.db_table}.{extension}'
+            + ('.gz' if compress else ''))
+
+
+def open_file(path, mode, compress):
+    """Файл таблицы: для COPY - бинарный, для NDJSON - текстовый."""
+    mode += 'b' if use_copy() else 't'
+    encoding = None if use_copy() else 'utf-8'
+    if compress:
+        return gzip.open(path, mode, compresslevel=compress,
+                         encoding=encoding)
+    return open(path, mode, encoding=encoding)
+
+
+@contextmanager
+def export_snapshot():
+    """Транзакция REPEATABLE READ, из которой выгружается снимок.
+
+    На PostgreSQL возвращает идентификатор экспортированного снимка
+    (pg_export_snapshot): пока транзакция открыта, другие соединения
+    читают те же данные через import_snapshot. На остальных базах
+    возвращает None - таблицы выгружаются внутри этой транзакции.
+    """
+    with transaction.atomic():
+        if not use_copy():
+            yield None
+            return
+        with connection.cursor() as cursor:
+            cursor.execute('SET TRANSACTION ISOLATION LEVEL REPEATABLE READ')
+            cursor.execute('SELECT pg_export_snapshot()')
+            snapshot_id = cursor.fetchone()[0]
+        yield snapshot_id
+
+
+@contextmanager
+def import_snapshot(snapshot_id):
+    """Транзакция текущего соединения, читающая снимок snapshot_id."""
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute('SET TRANSACTION ISOLATION LEVEL REPEATABLE READ')
+            cursor.execute('SET TRANSACTION SNAPSHOT %s', [snapshot_id])
+        yield
+
+
+def referencing_models(models):
+    """models и все модели, ссылающиеся на них внешними ключами
+    (например, токены пользователей), - как TRUNCATE ... CASCADE."""
+    result = list(models)
+    for model in result:
+        for relation in get_candidate_relations_to_delete(model._meta):
+            if relation.related_model not in result:
+                result.append(relation.related_model)
+    return result
+
+
+def dependency_levels(models):
+    """Модели по уровням: модель попадает на уровень после всех
+    моделей, на которые ссылаются её внешние ключи."""
+    remaining = list(models)
+    levels = []
+    placed = set()
+    while remaining:
+        level = [
+            model for model in remaining
+            if all(field.related_model in placed
+                   or field.related_model not in remaining
+                   or field.related_model is model
+                   for field in table_fields(model) if field.is_relation)
+        ]
+        if not level:
+            raise ValueError('Циклическая зависимость таблиц!')
+        levels.append(level)
+        placed.update(level)
+        remaining = [model for model in remaining if model not in placed]
+    return levels
+
+
+def dump_table(model, directory, compress, anonymize):
+    """Выгружает таблицу в файл, возвращает описание для манифеста."""
+    fields = table_fields(model)
+    anonymize = anonymize and model is User
+    name = file_name(model, compress)
+    with open_file(os.path.join(directory, name), 'w', compress) as file:
+        if use_copy():
+            rows = dump_copy(model, fields, file, anonymize)
+        else:
+            rows = dump_ndjson(model, fields, file, anonymize)
+    return {'model': model._meta.label, 'file': name, 'rows': rows,
+            'columns': [field.column for field in fields]}
+
+
+def dump_copy(model, fields, file, anonymize):
+    quote = connection.ops.quote_name
+    pk = quote(model._meta.pk.column)
+    prefix, suffix = ANONYMOUS_EMAIL
+    columns = [
+        f"'{prefix}' || {pk} || '{suffix}' AS {quote(field.column)}"
+        if anonymize and field.name == 'email' else quote(field.column)
+        for field in fields
+    ]
+    with connection.cursor() as cursor:
+        cursor.copy_expert(
+            f'COPY (SELECT {", ".join(columns)} '
+            f'FROM {quote(model._meta.db_table)} ORDER BY {pk}) TO STDOUT',
+            file
+        )
+        return cursor.rowcount
+
+
+def dump_ndjson(model, fields, file, anonymize):
+    rows = 0
+    email = next((index for index, field in enumerate(fields)
+                  if anonymize and field.name == 'email'), None)
+    for row in model._base_manager.order_by('pk').values_list(
+        *(field.attname for field in fields)
+    ).iterator(chunk_size=NDJSON_BATCH_SIZE):
+        if email is not None:
+            prefix, suffix = ANONYMOUS_EMAIL
+            row = list(row)
+            row[email] = f'{prefix}{row[0]}{suffix}'
+        file.write(json.dumps(row, cls=DjangoJSONEncoder,
+                              ensure_ascii=False))
+        file.write('\n')
+        rows += 1
+    return rows
+
+
+def restore_table(model, directory, entry, compress):
+    """Загружает таблицу из файла снимка одной транзакцией."""
+    fields = table_fields(model)
+    columns = [field.column for field in fields]
+    if entry['columns'] != columns:
+        raise ValueError(f'Колонки {model._meta.db_table} в снимке '
+                         f'не совпадают со схемой базы!')
+    path = os.path.join(directory, entry['file'])
+    with open_file(path, 'r', compress) as file, transaction.atomic():
+        if use_copy():
+            quote = connection.ops.quote_name
+            with connection.cursor() as cursor:
+                cursor.copy_expert(
+                    f'COPY {quote(model._meta.db_table)} '
+                    f'({", ".join(map(quote, columns))}) FROM STDIN',
+                    file
+                )
+                return cursor.rowcount
+        return restore_ndjson(model, fields, file)
+
+
+def restore_ndjson(model, fields, file):
+    """Вставка строк пачками через executemany: bulk_create
+    перезаписал бы поля auto_now_add."""
+    quote = connection.ops.quote_name
+    sql = 'INSERT INTO {} ({}) VALUES ({})'.format(
+        quote(model._meta.db_table),
+        ', '.join(quote(field.column) for field in fields),
+        ', '.join(['%s'] * len(fields))
+    )
+    rows = 0
+    with connection.cursor() as cursor:
+        for lines in chunks(file, NDJSON_BATCH_SIZE):
+            cursor.executemany(sql, [
+                [field.get_db_prep_save(field.to_python(value), connection)
+                 for field, value in zip(fields, json.loads(line))]
+                for line in lines
+            ])
+            rows += len(lines)
+    return rows
+
+
+def clear_tables(models):
+    """Удаляет данные таблиц снимка и ссылающихся на них таблиц
+    перед загрузкой."""
+    if use_copy():
+        quote = connection.ops.quote_name
+        with connection.cursor() as cursor:
+            cursor.execute('TRUNCATE {} CASCADE'.format(', '.join(
+                quote(model._meta.db_table) for model in models
+            )))
+        return
+    for level in reversed(dependency_levels(referencing_models(models))):
+        for model in level:
+            queryset = model._base_manager.all()
+            queryset._raw_delete(queryset.db)
+
+
+def reset_sequences(models):
+    with connection.cursor() as cursor:
+        for sql in connection.ops.sequence_reset_sql(no_style(), models):
+            cursor.execute(sql)
@@ -0,0 +1,49 @@
+import hashlib
+import os
+import uuid
+
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """Хранилище, в котором имя файла - SHA-256 его содержимого.
+
+    Повторная загрузка того же изображения не создаёт новый файл,
+    а возвращает уже сохранённый. Файлы никогда не перезаписываются,
+    поэтому их можно отдавать с долгим неизменяемым кэшированием.
+
+    Файл сначала пишется под временным уникальным именем и затем
+    атомарно переименовывается: одновременная загрузка того же
+    изображения в другом воркере заменяет файл идентичным, а не
+    конфликтует с ним. У уже существующего файла обновляется mtime:
+    очистка не удаляет файлы моложе ORPHAN_MEDIA_MIN_AGE, поэтому
+    файл, повторно использованный ещё не закоммиченным рецептом,
+    не удаляется.
+    """
+
+    def content_name(self, name, content):
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+        directory = os.path.dirname(name)
+        extension = os.path.splitext(name)[1].lower()
+        hexdigest = digest.hexdigest()
+        return os.path.join(directory, hexdigest[:2],
+                            hexdigest + extension)
+
+    def get_available_name(self, name, max_length=None):
+        return name
+
+    def _save(self, name, content):
+        name = self.content_name(name, content)
+        try:
+            os.utime(self.path(name))
+            return name
+        except FileNotFoundError:
+            pass
+        temporary = super()._save(f'{name}.{uuid.uuid4().hex}.part', content)
+        os.replace(self.path(temporary), self.path(name))
+        return name
@@ -0,0 +1,118 @@
+from collections import defaultdict
+from datetime import timedelta
+from functools import reduce
+from operator import or_
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from recipes.models import Change
+
+GLOBAL_MODELS = ('recipe', 'tag', 'ingredient')
+USER_MODELS = ('favorite', 'cart', 'subscription')
+
+
+def next_seq_sql(table, column):
+    """Выражение следующего номера seq: на PostgreSQL - из
+    последовательности, на SQLite (запись в базу последовательна) -
+    максимальный номер плюс один."""
+    if connection.vendor == 'postgresql':
+        return f"nextval(pg_get_serial_sequence('{table}', '{column}'))"
+    quote = connection.ops.quote_name
+    return (f'(SELECT COALESCE(MAX({quote(column)}), 0) + 1 '
+            f'FROM {quote(table)})')
+
+
+def record_change(model, object_id, user_id=0, deleted=False):
+    record_changes(model, [object_id], user_id, deleted)
+
+
+def record_changes(model, object_ids, user_id=0, deleted=False):
+    """Присваивает изменениям объектов новые номера в журнале:
+    INSERT ... ON CONFLICT DO UPDATE на каждый объект."""
+    meta = Change._meta
+    quote = connection.ops.quote_name
+    seq = meta.pk.column
+    model_column, object_column, user_column, deleted_column, time_column = (
+        quote(meta.get_field(name).column)
+        for name in ('model', 'object_id', 'user_id', 'deleted', 'changed_at')
+    )
+    changed_at = meta.get_field('changed_at').get_db_prep_save(
+        timezone.now(), connection
+    )
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f'INSERT INTO {quote(meta.db_table)} ({model_column}, '
+            f'{object_column}, {user_column}, {deleted_column}, '
+            f'{time_column}) VALUES (%s, %s, %s, %s, %s) '
+            f'ON CONFLICT ({model_column}, {user_column}, {object_column}) '
+            f'DO UPDATE SET {quote(seq)} = '
+            f'{next_seq_sql(meta.db_table, seq)}, '
+            f'{deleted_column} = %s, {time_column} = %s',
+            [[model, object_id, user_id, deleted, changed_at, deleted,
+              changed_at] for object_id in object_ids]
+        )
+
+
+def record_deletions(model, entries):
+    """Tombstones пачки объектов: entries - пары (object_id, user_id)."""
+    entries = set(entries)
+    if not entries:
+        return
+    by_object, by_user = defaultdict(set), defaultdict(set)
+    for object_id, user_id in entries:
+        by_object[object_id].add(user_id)
+        by_user[user_id].add(object_id)
+    if len(by_user) <= len(by_object):
+        existing = (Q(user_id=user_id, object_id__in=object_ids)
+                    for user_id, object_ids in by_user.items())
+    else:
+        existing = (Q(object_id=object_id, user_id__in=user_ids)
+                    for object_id, user_ids in by_object.items())
+    with transaction.atomic():
+        Change.objects.filter(reduce(or_, existing), model=model).delete()
+        Change.objects.bulk_create(
+            (Change(model=model, object_id=object_id, user_id=user_id,
+                    deleted=True)
+             for object_id, user_id in entries),
+            ignore_conflicts=True
+        )
+
+
+def changes_since(since, user, limit):
+    """Изменения с номером больше since, видимые пользователю.
+
+    Возвращает словарь {модель: {'changed': [...], 'deleted': [...]}}
+    с id объектов, токен для следующего запроса и признак того,
+    что остались ещё изменения.
+
+    Номер seq выдаётся при записи, а не при коммите: транзакция
+    с меньшим номером может закоммититься позже. Поэтому токен
+    не заходит за изменения моложе SYNC_SAFETY_WINDOW секунд - они
+    вернутся клиенту повторно, а пропущенных изменений не будет.
+    """
+    visible = Q(user_id=0)
+    if user.is_authenticated:
+        visible |= Q(user_id=user.pk)
+    entries = list(
+        Change.objects.filter(visible, seq__gt=since)
+        .order_by('seq')
+        .values_list('seq', 'model', 'object_id', 'deleted',
+                     'changed_at')[:limit + 1]
+    )
+    has_more = len(entries) > limit
+    entries = entries[:limit]
+    changes = {
+        model: {'changed': [], 'deleted': []}
+        for model in GLOBAL_MODELS + USER_MODELS
+    }
+    horizon = timezone.now() - timedelta(seconds=settings.SYNC_SAFETY_WINDOW)
+    token, settled = since, True
+    for seq, model, object_id, deleted, changed_at in entries:
+        changes[model]['deleted' if deleted else 'changed'].append(object_id)
+        settled = settled and changed_at < horizon
+        if settled:
+            token = seq
+    return changes, token, has_more and settled
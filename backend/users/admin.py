@@ -1,10 +1,12 @@
 from django.contrib import admin
 
+from recipes.admin import BulkDeleteMixin
+from recipes.deletion import delete_users_later
 from users.models import User, Subscribe
 
 
 @admin.register(User)
-class UserAdmin(admin.ModelAdmin):
+class UserAdmin(BulkDeleteMixin, admin.ModelAdmin):
     list_display = ('id',
                     'username',
                     'first_name',
@@ -13,6 +15,12 @@ class UserAdmin(admin.ModelAdmin):
                     )
     search_fields = ('email', 'username')
 
+    def delete_model(self, request, obj):
+        delete_users_later([obj.pk])
+
+    def delete_queryset(self, request, queryset):
+        delete_users_later(queryset.values_list('pk', flat=True))
+
 
 @admin.register(Subscribe)
 class SubscribeAdmin(admin.ModelAdmin):
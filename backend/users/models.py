@@ -4,6 +4,7 @@ from django.db import models
 from api.validators import validate_username
 from foodgram.constants import (
     EMAIL_MAX_LENGTH,
+    JTI_MAX_LENGTH,
     USER_MAX_LENGTH
 )
 
@@ -43,6 +44,60 @@ class User(AbstractUser):
         return f'{self.first_name} {self.last_name}'
 
 
+class ClaimsUser(User):
+    """Пользователь, собранный из claims JWT без запроса к БД.
+
+    Загружены только поля из токена, остальные (в том числе флаги
+    прав) отложены и читаются из БД при обращении. save() перечитывает
+    строку из БД и записывает только поля, изменённые после загрузки,
+    поэтому устаревшие claims не попадают в базу.
+    """
+
+    loaded_values = None
+
+    class Meta:
+        proxy = True
+
+    @classmethod
+    def from_claims(cls, claims):
+        user = cls.from_db('default', list(claims), [
+            claims[field.attname] for field in cls._meta.concrete_fields
+            if field.attname in claims
+        ])
+        user.loaded_values = dict(claims)
+        return user
+
+    def field_attnames(self):
+        return [field.attname for field in self._meta.concrete_fields
+                if not field.primary_key]
+
+    def refresh_from_db(self, using=None, fields=None):
+        super().refresh_from_db(using, fields)
+        if self.loaded_values is not None:
+            self.loaded_values.update(
+                (name, self.__dict__[name])
+                for name in (fields or self.field_attnames())
+                if name in self.__dict__
+            )
+
+    def save(self, *args, **kwargs):
+        if self.loaded_values is None or self._state.adding:
+            return super().save(*args, **kwargs)
+        changed = {
+            name: self.__dict__[name] for name in self.field_attnames()
+            if name in self.__dict__
+            and (name not in self.loaded_values
+                 or self.loaded_values[name] != self.__dict__[name])
+        }
+        self.refresh_from_db(fields=[name for name in self.field_attnames()
+                                     if name not in changed])
+        self.__dict__.update(changed)
+        if kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = list(changed)
+        super().save(*args, **kwargs)
+        self.loaded_values.update(changed)
+
+
 class Subscribe(models.Model):
     """Модель подписки."""
 
@@ -67,3 +122,23 @@ class Subscribe(models.Model):
 
     def __str__(self):
         return f'{self.user} подписан на {self.author}'
+
+
+class RevokedToken(models.Model):
+    """Отозванный JWT. С пустым jti отозваны все токены пользователя,
+    выданные до revoked_at. Запись не нужна после expires_at."""
+
+    user_id = models.BigIntegerField(verbose_name='id пользователя')
+    jti = models.CharField(verbose_name='Идентификатор токена',
+                           max_length=JTI_MAX_LENGTH,
+                           blank=True)
+    revoked_at = models.DateTimeField(verbose_name='Отозван')
+    expires_at = models.DateTimeField(verbose_name='Истекает',
+                                      db_index=True)
+
+    class Meta:
+        verbose_name = 'Отозванный токен'
+        verbose_name_plural = 'Отозванные токены'
+
+    def __str__(self):
+        return f'{self.user_id}: {self.jti or "все токены"}'
@@ -0,0 +1,289 @@
+#!/usr/bin/env python
+"""Нагрузочное тестирование API Foodgram.
+
+Скрипт использует только стандартную библиотеку и запускается против
+локально поднятого backend. Сценарии выбираются случайно с весами из
+файла смеси, запросы отправляются с заданной частотой (открытая
+модель нагрузки), результаты по каждому эндпоинту сохраняются в JSON.
+"""
+import argparse
+import base64
+import json
+import math
+import random
+import struct
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+import zlib
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode
+
+
+def tiny_png():
+    """PNG 2x2 без Pillow - для рецептов с изображением."""
+    def chunk(kind, data):
+        body = kind + data
+        return (struct.pack('>I', len(data)) + body
+                + struct.pack('>I', zlib.crc32(body) & 0xffffffff))
+    raw = b''.join(b'\x00' + bytes((random.randrange(256), 0, 0)) * 2
+                   for _ in range(2))
+    png = (b'\x89PNG\r\n\x1a\n'
+           + chunk(b'IHDR', struct.pack('>IIBBBBB', 2, 2, 8, 2, 0, 0, 0))
+           + chunk(b'IDAT', zlib.compress(raw))
+           + chunk(b'IEND', b''))
+    return 'data:image/png;base64,' + base64.b64encode(png).decode()
+
+
+class Client:
+    """HTTP-клиент одного виртуального пользователя."""
+
+    def __init__(self, base_url, timeout):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.token = None
+
+    def request(self, method, path, data=None):
+        headers = {'Content-Type': 'application/json'}
+        if self.token:
+            headers['Authorization'] = f'Token {self.token}'
+        body = json.dumps(data).encode() if data is not None else None
+        request = urllib.request.Request(self.base_url + path, data=body,
+                                         headers=headers, method=method)
+        try:
+            with urllib.request.urlopen(request,
+                                        timeout=self.timeout) as response:
+                return response.status, response.read()
+        except urllib.error.HTTPError as error:
+            return error.code, error.read()
+
+    def login(self, index):
+        email = f'loadtest{index}@example.com'
+        password = 'Loadtest-password-1'
+        self.request('POST', '/api/users/', {
+            'email': email, 'username': f'loadtest{index}',
+            'first_name': 'Load', 'last_name': f'Test{index}',
+            'password': password,
+        })
+        status, body = self.request('POST', '/api/auth/token/login/',
+                                    {'email': email, 'password': password})
+        if status != 200:
+            raise RuntimeError(f'Не удалось войти: {status} {body[:200]}')
+        self.token = json.loads(body)['auth_token']
+
+
+class Scenarios:
+    """Сценарии нагрузки. Каждый возвращает (эндпоинт, метод, путь, тело)."""
+
+    def __init__(self, tags, ingredients, recipe_ids):
+        self.tags = tags
+        self.ingredients = ingredients
+        self.recipe_ids = recipe_ids
+
+    def browse(self):
+        choice = random.random()
+        if choice < 0.5:
+            page = random.randint(1, 5)
+            return 'recipes-list', 'GET', f'/api/recipes/?page={page}', None
+        if choice < 0.8 and self.recipe_ids:
+            recipe_id = random.choice(self.recipe_ids)
+            return 'recipes-detail', 'GET', f'/api/recipes/{recipe_id}/', None
+        if choice < 0.9:
+            return 'tags-list', 'GET', '/api/tags/', None
+        prefix = random.choice(self.ingredients)['name'][:2]
+        return ('ingredients-list', 'GET',
+                '/api/ingredients/?' + urlencode({'name': prefix}), None)
+
+    def filtered_feed(self):
+        params = [('tags', tag['slug'])
+                  for tag in random.sample(self.tags,
+                                           min(len(self.tags), 2))]
+        if random.random() < 0.3:
+            params.append(('is_favorited', 1))
+        if random.random() < 0.2:
+            params.append(('is_in_shopping_cart', 1))
+        return ('recipes-filtered', 'GET',
+                '/api/recipes/?' + urlencode(params), None)
+
+    def toggle(self):
+        if not self.recipe_ids:
+            return self.browse()
+        recipe_id = random.choice(self.recipe_ids)
+        kind = random.choice(('favorite', 'shopping_cart'))
+        method = random.choice(('POST', 'DELETE'))
+        return (f'recipes-{kind}', method,
+                f'/api/recipes/{recipe_id}/{kind}/', None)
+
+    def create_recipe(self):
+        count = random.randint(2, min(10, len(self.ingredients)))
+        return 'recipes-create', 'POST', '/api/recipes/', {
+            'ingredients': [
+                {'id': ingredient['id'], 'amount': random.randint(1, 500)}
+                for ingredient in random.sample(self.ingredients, count)
+            ],
+            'tags': [random.choice(self.tags)['id']],
+            'image': tiny_png(),
+            'name': f'Нагрузочный рецепт {random.randint(1, 10 ** 6)}',
+            'text': 'Рецепт создан нагрузочным тестом.',
+            'cooking_time': random.randint(5, 120),
+        }
+
+    def download_cart(self):
+        return ('recipes-download-cart', 'GET',
+                '/api/recipes/download_shopping_cart/', None)
+
+
+class Stats:
+    """Задержки и ошибки по эндпоинтам."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(lambda: defaultdict(int))
+        self.errors = defaultdict(int)
+
+    def record(self, endpoint, latency, status):
+        with self.lock:
+            self.latencies[endpoint].append(latency)
+            self.statuses[endpoint][str(status)] += 1
+            if status is None or status >= 500 or status == 429:
+                self.errors[endpoint] += 1
+
+    @staticmethod
+    def percentile(values, percent):
+        """Перцентиль по методу ближайшего ранга (values отсортирован)."""
+        rank = math.ceil(percent / 100 * len(values))
+        return values[min(max(rank, 1), len(values)) - 1]
+
+    def report(self, duration):
+        endpoints = {}
+        for endpoint, values in sorted(self.latencies.items()):
+            values.sort()
+            endpoints[endpoint] = {
+                'requests': len(values),
+                'throughput_rps': round(len(values) / duration, 2),
+                'error_rate': round(self.errors[endpoint] / len(values), 4),
+                'statuses': dict(self.statuses[endpoint]),
+                'p50_ms': round(self.percentile(values, 50) * 1000, 2),
+                'p95_ms': round(self.percentile(values, 95) * 1000, 2),
+                'p99_ms': round(self.percentile(values, 99) * 1000, 2),
+                'max_ms': round(values[-1] * 1000, 2),
+            }
+        total = sum(len(values) for values in self.latencies.values())
+        return {
+            'duration_s': round(duration, 2),
+            'requests': total,
+            'throughput_rps': round(total / duration, 2),
+            'errors': sum(self.errors.values()),
+            'endpoints': endpoints,
+        }
+
+
+def prepare(base_url, users, timeout):
+    """Создаёт пользователей и загружает справочники."""
+    clients = []
+    for index in range(users):
+        client = Client(base_url, timeout)
+        client.login(index)
+        clients.append(client)
+    anonymous = Client(base_url, timeout)
+    tags = json.loads(anonymous.request('GET', '/api/tags/')[1])
+    ingredients = json.loads(
+        anonymous.request('GET', '/api/ingredients/')[1]
+    )[:500]
+    if not tags or not ingredients:
+        raise RuntimeError('Загрузите теги и ингредиенты '
+                           '(manage.py loadingredientstags).')
+    recipes = json.loads(
+        anonymous.request('GET', '/api/recipes/?limit=100')[1]
+    )['results']
+    return anonymous, clients, Scenarios(
+        tags, ingredients, [recipe['id'] for recipe in recipes]
+    )
+
+
+def run(args, mix):
+    anonymous, clients, scenarios = prepare(args.url, args.users,
+                                            args.timeout)
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    stats = Stats()
+
+    def execute(endpoint, method, path, data, client):
+        start = time.perf_counter()
+        try:
+            status, _ = client.request(method, path, data)
+        except OSError:
+            status = None
+        stats.record(endpoint, time.perf_counter() - start, status)
+
+    interval = 1 / args.rate
+    started = time.perf_counter()
+    deadline = started + args.duration
+    next_at = started
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        while next_at < deadline:
+            delay = next_at - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            name = random.choices(names, weights)[0]
+            client = (anonymous if name == 'browse' and random.random() < 0.7
+                      else random.choice(clients))
+            pool.submit(execute, *getattr(scenarios, name)(), client)
+            next_at += interval
+    return stats.report(time.perf_counter() - started)
+
+
+def compare(report, baseline):
+    """Печатает изменение p95 и пропускной способности по эндпоинтам."""
+    for endpoint, current in report['endpoints'].items():
+        previous = baseline['endpoints'].get(endpoint)
+        if previous is None:
+            continue
+        print(f'{endpoint:28} p95 {previous["p95_ms"]:>8} -> '
+              f'{current["p95_ms"]:>8} мс, ошибки '
+              f'{previous["error_rate"]:.2%} -> {current["error_rate"]:.2%}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', default='http://127.0.0.1:8000')
+    parser.add_argument('--mix', default='mix.json',
+                        help='JSON с весами сценариев.')
+    parser.add_argument('--rate', type=float, default=20,
+                        help='Целевое число запросов в секунду.')
+    parser.add_argument('--duration', type=float, default=60)
+    parser.add_argument('--users', type=int, default=10)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--timeout', type=float, default=30)
+    parser.add_argument('--seed', type=int)
+    parser.add_argument('--output', default='loadtest-result.json')
+    parser.add_argument('--compare', help='Предыдущий JSON для сравнения.')
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    with open(args.mix, encoding='utf-8') as file:
+        mix = json.load(file)
+    report = run(args, mix)
+    report['config'] = {'rate': args.rate, 'duration': args.duration,
+                        'users': args.users, 'mix': mix}
+    with open(args.output, 'w', encoding='utf-8') as file:
+        json.dump(report, file, ensure_ascii=False, indent=2)
+    json.dump({key: value for key, value in report.items()
+               if key != 'endpoints'}, sys.stdout, ensure_ascii=False)
+    print()
+    for endpoint, values in report['endpoints'].items():
+        print(f'{endpoint:28} {values["requests"]:>6} запр. '
+              f'p50 {values["p50_ms"]:>8} p95 {values["p95_ms"]:>8} '
+              f'p99 {values["p99_ms"]:>8} мс, '
+              f'ошибки {values["error_rate"]:.2%}')
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as file:
+            compare(report, json.load(file))
+
+
+if __name__ == '__main__':
+    main()